@@ -48,22 +48,37 @@ class Expression(object):
     Behavior of the query language is encoded in the various transform
     functions. Expression themselves have no behavior, and only contain
     children and type and arity information.
+
+    Expressions use __slots__, so they have no __dict__ and arbitrary
+    attributes can no longer be set on them (subclasses that need some can
+    declare their own __slots__). They are also treated as immutable: the hash
+    is computed once, so 'children' must not be reassigned after the
+    expression has been hashed.
     """
 
     __abstract = True
 
-    children = ()
-    arity = 0
+    # children: Tuple of subexpressions.
+    # start: Start of the expression's source code in 'source'.
+    # end: End of the expression's source code in 'source'.
+    # source: The source code of the query this expression belongs to.
+    # _hash: Cached hash. Hashing walks the whole subtree, and children never
+    #     change after __init__, so each node only does it once.
+    #
+    # Queries can have many nodes, so they don't get a __dict__. Subclasses
+    # declare empty __slots__ to keep it that way.
+    __slots__ = ("children", "start", "end", "source", "_hash")
 
-    start = None  # Start of the expression's source code in 'source'.
-    end = None  # End of the expression's source code in 'source'.
-    source = None  # The source code of the query this expression belongs to.
+    arity = 0
 
     type_signature = (protocol.AnyType,)
     return_signature = protocol.AnyType
 
     def __hash__(self):
-        return hash((type(self), self.children))
+        if self._hash is None:
+            self._hash = hash((type(self), self.children))
+
+        return self._hash
 
     def __eq__(self, other):
         return isinstance(other, type(self)) and self.children == other.children
@@ -74,6 +89,7 @@ class Expression(object):
     def __init__(self, *children, **kwargs):
         super(Expression, self).__init__()
 
+        self._hash = None
         self.start = kwargs.pop("start", None)
         self.end = kwargs.pop("end", None)
         self.source = kwargs.pop("source", None)
@@ -87,6 +103,38 @@ class Expression(object):
 
         self.children = children
 
+    @classmethod
+    def from_children(cls, children, start=None, end=None, source=None):
+        """Build an expression from a sequence of already valid children.
+
+        This is for transforms that rebuild a node from the (transformed)
+        children of another node of the same type. It skips the argument
+        checks in __init__, so the caller must make sure the number of children
+        is right for 'cls'.
+        """
+        if (six.get_unbound_function(cls.__init__)
+                is not _EXPRESSION_INIT):
+            # Subclasses with their own __init__ need it called.
+            return cls(*children, start=start, end=end, source=source)
+
+        expr = cls.__new__(cls)
+        expr._hash = None
+        expr.children = tuple(children)
+        expr.start = start
+        expr.end = end
+        expr.source = source
+        return expr
+
+    # Classes with __slots__ and no __dict__ need these to pickle with the
+    # protocols 0 and 1 on Python 2. The cached hash is left out, because hashes
+    # of strings differ between processes.
+    def __getstate__(self):
+        return (self.children, self.start, self.end, self.source)
+
+    def __setstate__(self, state):
+        self.children, self.start, self.end, self.source = state
+        self._hash = None
+
     def __repr__(self):
         if len(self.children) == 1:
             return "%s(%r)" % (type(self).__name__, self.children[0])
@@ -102,8 +150,12 @@ class Expression(object):
         return "%s(\n%s)" % (type(self).__name__, "\n".join(lines))
 
 
+_EXPRESSION_INIT = six.get_unbound_function(Expression.__init__)
+
+
 class ValueExpression(Expression):
     """Unary expression."""
+    __slots__ = ()
     arity = 1
     __abstract = True
     return_signature = protocol.AnyType
@@ -114,6 +166,7 @@ class ValueExpression(Expression):
 
 
 class BinaryExpression(Expression):
+    __slots__ = ()
     arity = 2
     __abstract = True
 
@@ -128,6 +181,7 @@ class BinaryExpression(Expression):
 
 class VariadicExpression(Expression):
     """Represents an expression with variable arity."""
+    __slots__ = ()
 
     type_signature = protocol.AnyType
     arity = None
@@ -138,23 +192,27 @@ class VariadicExpression(Expression):
 
 class Literal(ValueExpression):
     """Represents a literal, which is to say not-an-expression."""
+    __slots__ = ()
 
     type_signature = None  # Depends on literal.
 
 
 class Var(ValueExpression):
     """Represents a member of the evaluated object - attributes of entity."""
+    __slots__ = ()
 
     type_signature = (six.string_types[0],)
 
 
 class UnaryOperation(ValueExpression):
     """Represents an operation on a single operand (subexpression)."""
+    __slots__ = ()
     __abstract = True
 
 
 class Complement(UnaryOperation):
     """Logical NOT."""
+    __slots__ = ()
 
     type_signature = (boolean.IBoolean,)
     return_signature = boolean.IBoolean
@@ -164,6 +222,7 @@ class Complement(UnaryOperation):
 
 class Pair(BinaryExpression):
     """Represents a key/value pair."""
+    __slots__ = ()
 
     type_signature = (protocol.AnyType, protocol.AnyType)
     return_signature = tuple
@@ -182,6 +241,7 @@ class Select(BinaryExpression):
 
     This usually roughly corresponds to array subscription (a[i]).
     """
+    __slots__ = ()
 
     type_signature = (associative.IAssociative, protocol.AnyType)
     return_signature = None
@@ -205,6 +265,7 @@ class Resolve(BinaryExpression):
     something that was available in the outside scope, but wasn't a member of
     the object.
     """
+    __slots__ = ()
 
     type_signature = (structured.IStructured, protocol.AnyType)
     return_signature = None
@@ -220,6 +281,7 @@ class Resolve(BinaryExpression):
 
 class IsInstance(BinaryExpression):
     """Evaluates to True if the current scope is an instance of type."""
+    __slots__ = ()
 
     type_signature = (protocol.AnyType, type)
     return_signature = bool
@@ -227,6 +289,7 @@ class IsInstance(BinaryExpression):
 
 class Cast(BinaryExpression):
     """Represents a typecast."""
+    __slots__ = ()
 
     type_signature = (protocol.AnyType, type)
     return_signature = protocol.AnyType
@@ -240,6 +303,7 @@ class Within(BinaryExpression):
     object holding the new vars, or a repeated variable of associative
     objects.
     """
+    __slots__ = ()
     __abstract = True
     type_signature = (structured.IStructured, protocol.AnyType)
     return_signature = None  # Depends on RHS.
@@ -258,10 +322,12 @@ class Map(Within):
 
     If left is a repeated value then this will return another repeated value.
     """
+    __slots__ = ()
 
 
 class Let(Within):
     """Works like Map, but over a single value on the LHS."""
+    __slots__ = ()
 
 
 class Filter(Within):
@@ -270,6 +336,7 @@ class Filter(Within):
     Will return a repeated variable containing only the values for which the
     expression on the right evaluated to true.
     """
+    __slots__ = ()
 
 
 class Reducer(BinaryExpression):
@@ -282,6 +349,7 @@ class Reducer(BinaryExpression):
     also be applied as functions using IApplicative, but when used using the
     IReducer protocol, typically exhibit better performance.
     """
+    __slots__ = ()
 
     return_signature = reducer.IReducer
     type_signature = (reducer.IReducer, repeated.IRepeated)
@@ -304,6 +372,7 @@ class Group(Within):
     row to a group, and at least one reducer applies an IReducer instance to
     the data. Use 'Reducer' to instantiate IReducers with mappers attached.
     """
+    __slots__ = ()
 
     arity = None
     type_signature = protocol.AnyType
@@ -324,21 +393,25 @@ class Group(Within):
 
 class Sort(Within):
     """Sorts the left hand side using the right hand side return."""
+    __slots__ = ()
 
 
 class Any(Within):
     """Returns true if the rhs evaluates as true for any value of lhs."""
+    __slots__ = ()
     return_signature = bool
     arity = None  # RHS is allowed to be omitted.
 
 
 class Each(Within):
     """Returns true if the rhs evaluates as true for every value of lhs."""
+    __slots__ = ()
     return_signature = bool
 
 
 class Membership(BinaryExpression):
     """Membership of element in set."""
+    __slots__ = ()
     type_signature = (eq.IEq, iset.ISet)
     return_signature = boolean.IBoolean
 
@@ -352,6 +425,7 @@ class Membership(BinaryExpression):
 
 
 class RegexFilter(BinaryExpression):
+    __slots__ = ()
     type_signature = (six.string_types[0], six.string_types[0])
     return_signature = boolean.IBoolean
 
@@ -368,6 +442,7 @@ class RegexFilter(BinaryExpression):
 
 class Apply(VariadicExpression):
     """Represents application of arguments to a function."""
+    __slots__ = ()
     type_signature = protocol.AnyType
     return_signature = protocol.AnyType
 
@@ -382,18 +457,21 @@ class Apply(VariadicExpression):
 
 class Bind(VariadicExpression):
     """Creates a new IAssociative of vars."""
+    __slots__ = ()
     type_signature = protocol.AnyType
     return_signature = associative.IAssociative
 
 
 class Repeat(VariadicExpression):
     """Creates a new IRepeated of values."""
+    __slots__ = ()
     type_signature = protocol.AnyType
     return_signature = repeated.IRepeated
 
 
 class Tuple(VariadicExpression):
     """Create a new tuple of values."""
+    __slots__ = ()
     type_signature = protocol.AnyType
     return_signature = tuple
 
@@ -411,6 +489,7 @@ class IfElse(VariadicExpression):
       be returned if the previous condition returned true.
     - The last child is the else block.
     """
+    __slots__ = ()
 
     def conditions(self):
         """The if-else pairs."""
@@ -426,6 +505,7 @@ class IfElse(VariadicExpression):
 # Logical Variadic ###
 
 class LogicalOperation(VariadicExpression):
+    __slots__ = ()
     type_signature = boolean.IBoolean
     return_signature = boolean.IBoolean
     __abstract = True
@@ -433,10 +513,12 @@ class LogicalOperation(VariadicExpression):
 
 class Union(LogicalOperation):
     """Logical OR (variadic)."""
+    __slots__ = ()
 
 
 class Intersection(LogicalOperation):
     """Logical AND (variadic)."""
+    __slots__ = ()
 
     # Subtle difference - this is /actually/ required to be a bool, as opposed
     # to a Union, where the return signature is only required to support
@@ -447,12 +529,14 @@ class Intersection(LogicalOperation):
 # Variadic Relations ###
 
 class Relation(VariadicExpression):
+    __slots__ = ()
     return_signature = boolean.IBoolean
     __abstract = True
 
 
 class OrderedSet(Relation):
     """Abstract class to represent strict and non-strict ordering."""
+    __slots__ = ()
 
     type_signature = ordered.IOrdered
     __abstract = True
@@ -460,18 +544,21 @@ class OrderedSet(Relation):
 
 class StrictOrderedSet(OrderedSet):
     """Greater than relation."""
+    __slots__ = ()
 
     type_signature = ordered.IOrdered
 
 
 class PartialOrderedSet(OrderedSet):
     """Great-or-equal than relation."""
+    __slots__ = ()
 
     type_signature = ordered.IOrdered
 
 
 class Equivalence(Relation):
     """Logical == (variadic)."""
+    __slots__ = ()
 
     type_signature = eq.IEq
 
@@ -480,6 +567,7 @@ class Equivalence(Relation):
 
 class NumericExpression(VariadicExpression):
     """Arithmetic expressions."""
+    __slots__ = ()
 
     return_signature = number.INumber
     __abstract = True
@@ -487,23 +575,27 @@ class NumericExpression(VariadicExpression):
 
 class Sum(NumericExpression):
     """Arithmetic + (variadic)."""
+    __slots__ = ()
 
     type_signature = number.INumber
 
 
 class Difference(NumericExpression):
     """Arithmetic - (variadic)."""
+    __slots__ = ()
 
     type_signature = number.INumber
 
 
 class Product(NumericExpression):
     """Arithmetic * (variadic)."""
+    __slots__ = ()
 
     type_signature = number.INumber
 
 
 class Quotient(NumericExpression):
     """Arithmetic / (variadic)."""
+    __slots__ = ()
 
     type_signature = number.INumber
@@ -25,10 +25,32 @@ This module implements multimethod function dispatch.
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
 import functools
+import itertools
 import six
 import threading
 
 
+# Bumped whenever any multimethod gains an implementation or a type preference.
+# See registration_count.
+_REGISTRATIONS = itertools.count(1)
+_registration_count = 0
+
+
+def registration_count():
+    """Return a number that changes whenever any dispatch table changes.
+
+    Callers that cache the results of dispatch beyond a single call (for
+    example, compiled queries) can compare this to the value they saw when
+    they filled the cache to tell whether it might be stale.
+    """
+    return _registration_count
+
+
+def _bump_registration_count():
+    global _registration_count
+    _registration_count = next(_REGISTRATIONS)
+
+
 def memoize(func):
     # Declare the class in this lexical scope so 'func' is bound to the
     # decorated callable.
@@ -141,7 +163,8 @@ class multimethod(object):
     # Locks _dispatch_table and implementations.
     _write_lock = None
 
-    # Cache of type -> implementation.
+    # Cache of type -> implementation. Cleared whenever implementations or
+    # preferences change.
     _dispatch_table = None
 
     # Table of which dispatch type is preferred over which other type in
@@ -159,6 +182,9 @@ class multimethod(object):
     # take classes as parameters.
     dispatch_function = None
 
+    # True if dispatch_function is default_dispatch, which __call__ inlines.
+    _dispatch_on_type = False
+
     def __init__(self, func, dispatch_function=None):
         self._write_lock = threading.Lock()
         self.func = func
@@ -166,6 +192,7 @@ class multimethod(object):
         self._prefer_table = {}
         self.implementations = []
         self.dispatch_function = dispatch_function or self.default_dispatch
+        self._dispatch_on_type = dispatch_function is None
         functools.update_wrapper(self, func)
 
     @staticmethod
@@ -187,8 +214,15 @@ class multimethod(object):
 
     def __call__(self, *args, **kwargs):
         """Pick the appropriate overload based on args and call it."""
-        dispatch_type = self.dispatch_function(args, kwargs)
-        implementation = self._find_and_cache_best_function(dispatch_type)
+        # Multimethods are called for every node and every row, so the common
+        # case (default dispatch, type already seen) is a single dict lookup.
+        if self._dispatch_on_type and args:
+            dispatch_type = type(args[0])
+        else:
+            dispatch_type = self.dispatch_function(args, kwargs)
+
+        implementation = (self._dispatch_table.get(dispatch_type)
+                          or self._find_and_cache_best_function(dispatch_type))
         if implementation:
             return implementation(*args, **kwargs)
 
@@ -215,6 +249,15 @@ class multimethod(object):
         candidate = self._find_and_cache_best_function(dispatch_type)
         return candidate is not None
 
+    def implementation_for_type(self, dispatch_type):
+        """Return the implementation for 'dispatch_type' or None.
+
+        Recursive visitors can use this to call the implementation directly,
+        skipping the overhead of __call__. None means __call__ would fall
+        through to the default behavior.
+        """
+        return self._find_and_cache_best_function(dispatch_type)
+
     def _preferred(self, preferred, over):
         prefs = self._prefer_table.get(preferred)
         if prefs and over in prefs:
@@ -248,6 +291,8 @@ class multimethod(object):
                     "Type %r is already preferred over %r." % (over, prefer))
             prefs = self._prefer_table.setdefault(prefer, set())
             prefs.add(over)
+            self._dispatch_table.clear()
+            _bump_registration_count()
         finally:
             self._write_lock.release()
 
@@ -405,5 +450,8 @@ class multimethod(object):
             self._write_lock.acquire()
             try:
                 self.implementations.append((t, unbound_implementation))
+                # Previously resolved types may now have a better match.
+                self._dispatch_table.clear()
+                _bump_registration_count()
             finally:
                 self._write_lock.release()
@@ -79,7 +79,19 @@ class LazyRepetition(object):
         """
         idx = 0
         generator = self._generator_func()
-        first_value = next(generator)
+        try:
+            first_value = next(generator)
+        except StopIteration:
+            # Empty generator - there are no values.
+            if self._count:
+                raise ValueError(
+                    "LazyRepetition %r previously had %d values but now has"
+                    " none! Generator function %r is not stable." %
+                    (self, self._count, self._generator_func))
+
+            self._count = 0
+            return
+
         self._value_type = type(first_value)
         yield first_value
 
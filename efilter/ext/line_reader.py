@@ -33,6 +33,11 @@ class LazyLineReader(object):
     fd = None
     _seek_lock = None
 
+    # Roughly how many bytes of lines to read between seeks. Seeking and
+    # especially tell() on text files are slow, so we don't want to do them
+    # for every line.
+    read_size_hint = 1 << 16
+
     def __init__(self, fd):
         self.fd = fd
         self._seek_lock = threading.Lock()
@@ -61,11 +66,39 @@ class LazyLineReader(object):
 
         return line, new_offset
 
+    def readlines_at_offset(self, offset):
+        """Read lines starting at 'offset' up to about 'read_size_hint'."""
+        lines = []
+        size = 0
+        self._seek_lock.acquire()
+        try:
+            self.fd.seek(offset)
+            # fd.readlines would be simpler, but on Python 3 text files it
+            # iterates the file, which disables tell().
+            readline = self.fd.readline
+            while True:
+                line = readline()
+                if not line:
+                    break
+
+                lines.append(line)
+                size += len(line)
+                if size >= self.read_size_hint:
+                    break
+
+            new_offset = self.fd.tell()
+        finally:
+            self._seek_lock.release()
+
+        return lines, new_offset
+
     def getvalues(self):
-        line, offset = self.readline_at_offset(0)
-        while line:
-            yield line
-            line, offset = self.readline_at_offset(offset)
+        lines, offset = self.readlines_at_offset(0)
+        while lines:
+            for line in lines:
+                yield line
+
+            lines, offset = self.readlines_at_offset(offset)
 
     def value_type(self):
         return six.string_types[0]
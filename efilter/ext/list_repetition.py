@@ -20,6 +20,7 @@ Implements IRepeated using a list container.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+from efilter.protocols import counted
 from efilter.protocols import repeated
 
 
@@ -74,6 +75,12 @@ class ListRepetition(object):
         # to blow up.
         return self._delegate[:]
 
+    # ICounted implementation:
+
+    def count(self):
+        # Don't go through getvalues, which would copy the delegate.
+        return len(self._delegate)
+
     def value_eq(self, other):
         if isinstance(other, type(self)):
             # pylint: disable=protected-access
@@ -99,5 +106,6 @@ class ListRepetition(object):
 
 
 repeated.IRepeated.implicit_static(ListRepetition)
+counted.ICounted.implicit_static(ListRepetition)
 repeated.repeated.implement(for_type=object,
                             implementation=ListRepetition)
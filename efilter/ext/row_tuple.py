@@ -58,6 +58,10 @@ class RowTuple(object):
     """
     ordered_dict = None
 
+    # Tuple of column names, in order. Columns are fixed by the constructor, so
+    # this is computed once.
+    _columns = None
+
     class __UnsetSentinel(object):
         """This is a sentinel value for columns that haven't been initialized.
 
@@ -90,6 +94,8 @@ class RowTuple(object):
             raise ValueError(
                 "RowTuple must be instantiated with values, columns or both.")
 
+        self._columns = tuple(self.ordered_dict.keys())
+
     def get_singleton(self):
         """If the row only has one column, return that value; otherwise raise.
 
@@ -118,7 +124,7 @@ class RowTuple(object):
 
     def select(self, idx):
         try:
-            key = tuple(self.ordered_dict.keys())[idx]
+            key = self._columns[idx]
         except TypeError:
             # Select should only raise KeyError or AttributeError.
             raise KeyError(idx)
@@ -141,7 +147,7 @@ class RowTuple(object):
         return value
 
     def getmembers_runtime(self):
-        return tuple(self.ordered_dict.keys())
+        return self._columns
 
     # Magic methods:
 
@@ -166,7 +172,7 @@ class RowTuple(object):
             if key >= len(self):
                 raise IndexError(key)
 
-            key = tuple(self.ordered_dict.keys())[key]
+            key = self._columns[key]
 
         if not key in self.ordered_dict:
             raise KeyError("%r doesn't contain var %r." % (self, key))
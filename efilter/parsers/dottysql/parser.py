@@ -73,6 +73,13 @@ from efilter.parsers.common import tokenizer
 from efilter.parsers.common import token_stream
 
 
+# Operators for which chains like 'x and y and z' parse as a single variadic
+# expression instead of nested binary ones. Only associative operators belong
+# here, because operands are evaluated left to right either way.
+ASSOCIATIVE_HANDLERS = frozenset([ast.Intersection, ast.Union, ast.Sum,
+                                  ast.Product])
+
+
 class Parser(syntax.Syntax):
     """Parses DottySQL and produces an efilter AST.
 
@@ -371,8 +378,16 @@ class Parser(syntax.Syntax):
                 rhs = self.operator(rhs,
                                     self.tokens.matched.operator.precedence)
 
-            lhs = operator.handler(lhs, rhs, start=lhs.start, end=rhs.end,
-                                   source=self.original)
+            if (type(lhs) is operator.handler
+                    and operator.handler in ASSOCIATIVE_HANDLERS):
+                # Extend the chain, so the solver doesn't have to recurse
+                # once per operator.
+                lhs = operator.handler.from_children(
+                    lhs.children + (rhs,), start=lhs.start, end=rhs.end,
+                    source=self.original)
+            else:
+                lhs = operator.handler(lhs, rhs, start=lhs.start, end=rhs.end,
+                                       source=self.original)
 
         return lhs
 
@@ -42,6 +42,7 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 import abc
 import six
+import weakref
 
 
 class AnyType(object):
@@ -75,11 +76,49 @@ def implements(obj, protocol):
     if isinstance(obj, type):
         raise TypeError("First argument to implements must be an instance. "
                         "Got %r." % obj)
-    return isinstance(obj, protocol) or issubclass(AnyType, protocol)
+
+    # Solvers ask this about values in every row, so go through isa's cache.
+    if isa(type(obj), protocol):
+        return True
+
+    # Proxy objects can pass isinstance for a __class__ other than their type.
+    return isinstance(obj, protocol)
+
+
+try:
+    _abc_cache_token = abc.get_cache_token
+except AttributeError:
+    # Python 2 doesn't have get_cache_token, but it has the counter behind it.
+    def _abc_cache_token():
+        return abc.ABCMeta._abc_invalidation_counter
+
+
+# Cache of cls -> {protocol: result of isa}. Type inference, validation and
+# 'implements' call isa for every node or value, and the abc subclass checks
+# are comparatively slow. Host applications may generate classes at runtime,
+# so the cache doesn't keep them alive. Registering any type with any ABC (such
+# as a Protocol) can change the answers, so the cache is dropped whenever the
+# abc cache token changes.
+_ISA_CACHE = weakref.WeakKeyDictionary()
+_isa_cache_token = None
 
 
 def isa(cls, protocol):
     """Does the type 'cls' participate in the 'protocol'?"""
+    global _isa_cache_token
+
+    token = _abc_cache_token()
+    if token != _isa_cache_token:
+        _ISA_CACHE.clear()
+        _isa_cache_token = token
+
+    try:
+        return _ISA_CACHE[cls][protocol]
+    except (KeyError, TypeError):
+        # TypeError means one of the types is unhashable or 'cls' can't be
+        # weakly referenced - don't cache it.
+        pass
+
     if not isinstance(cls, type):
         raise TypeError("First argument to isa must be a type. Got %s." %
                         repr(cls))
@@ -87,7 +126,14 @@ def isa(cls, protocol):
     if not isinstance(protocol, type):
         raise TypeError(("Second argument to isa must be a type or a Protocol. "
                          "Got an instance of %r.") % type(protocol))
-    return issubclass(cls, protocol) or issubclass(AnyType, protocol)
+
+    result = issubclass(cls, protocol) or issubclass(AnyType, protocol)
+    try:
+        _ISA_CACHE.setdefault(cls, {})[protocol] = result
+    except TypeError:
+        pass
+
+    return result
 
 
 class Protocol(six.with_metaclass(abc.ABCMeta, object)):
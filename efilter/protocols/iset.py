@@ -74,13 +74,16 @@ class ISet(protocol.Protocol):
 
 # Default implementations:
 
+# The builtin set methods accept any iterable for the other operand and pick
+# the cheaper side to iterate, so we don't need to copy 'y' into a frozenset.
+
 ISet.implement(
     for_types=(set, frozenset),
     implementations={
-        union: lambda x, y: x | frozenset(y),
-        intersection: lambda x, y: x & frozenset(y),
-        difference: lambda x, y: x - frozenset(y),
-        issuperset: lambda x, y: x >= frozenset(y),
+        union: lambda x, y: x.union(y),
+        intersection: lambda x, y: x.intersection(y),
+        difference: lambda x, y: x.difference(y),
+        issuperset: lambda x, y: x.issuperset(y),
         contains: lambda s, e: e in s
     }
 )
@@ -89,10 +92,10 @@ ISet.implement(
 ISet.implement(
     for_types=(list, tuple),
     implementations={
-        union: lambda x, y: frozenset(x) | frozenset(y),
-        intersection: lambda x, y: frozenset(x) & frozenset(y),
-        difference: lambda x, y: frozenset(x) - frozenset(y),
-        issuperset: lambda x, y: frozenset(x) >= frozenset(y),
+        union: lambda x, y: frozenset(x).union(y),
+        intersection: lambda x, y: frozenset(x).intersection(y),
+        difference: lambda x, y: frozenset(x).difference(y),
+        issuperset: lambda x, y: frozenset(x).issuperset(y),
         contains: lambda s, e: e in s
     }
 )
@@ -67,15 +67,32 @@ def meld(*values):
         meld("foo", None) # => "foo"
         meld(None) # => None
     """
+    return meld_iter(values)
+
+
+def meld_iter(values):
+    """Same as 'meld', but takes an iterable of values instead of varargs.
+
+    Prefer this when the values are already in a collection or come from a
+    generator, to avoid unpacking them into an argument tuple first.
+
+    Examples:
+        meld_iter(["foo", "bar"]) # => ListRepetition("foo", "bar")
+        meld_iter(x for x in ("foo", None)) # => "foo"
+    """
     values = [x for x in values if x is not None]
     if not values:
         return None
 
+    if len(values) == 1 and not isinstance(values[0], IRepeated):
+        return values[0]
+
     result = repeated(*values)
     if isrepeating(result):
         return result
 
-    return getvalue(result)
+    # We already know there's at most one value, so skip getvalue's check.
+    return next(iter(getvalues(result)), None)
 
 
 @dispatch.multimethod
@@ -119,13 +136,16 @@ def getvalues(x):
 
 def getvalue(x):
     """Return the single value of x or raise TypError if more than one value."""
+    if not isinstance(x, IRepeated):
+        # Scalars are their own single value - no need to dispatch.
+        return x
+
     if isrepeating(x):
         raise TypeError(
             "Ambiguous call to getvalue for %r which has more than one value."
             % x)
 
-    for value in getvalues(x):
-        return value
+    return next(iter(getvalues(x)), None)
 
 
 @dispatch.multimethod
@@ -157,18 +177,37 @@ class IRepeated(protocol.Protocol):
     _optional_functions = (isrepeating,)
 
 
+def _scalar_getvalues(x):
+    if x is None:
+        return ()
+
+    return (x,)
+
+
 def _scalar_value_eq(x, y):
+    if not isinstance(y, IRepeated):
+        # Both are scalars - skip the isrepeating and getvalue dispatch.
+        return eq.eq(x, y)
+
     if isrepeating(y):
         return False
 
-    return eq.eq(x, getvalue(y))
+    return eq.eq(x, next(iter(getvalues(y)), None))
+
+
+def _scalar_value_apply(x, f):
+    return f(x)
+
+
+def _repeated_count(r):
+    return len(getvalues(r))
 
 
 # If you're repeated, you automatically implement ICounted.
 counted.ICounted.implement(
     for_type=IRepeated,
     implementations={
-        counted.count: lambda r: len(getvalues(r))
+        counted.count: _repeated_count
     }
 )
 
@@ -183,13 +222,12 @@ ordered.IOrdered.implement(
 
 
 # Implementation for scalars:
-# pylint: disable=unnecessary-lambda
 IRepeated.implement(
     for_type=protocol.AnyType,
     implementations={
-        getvalues: lambda x: (x,) if x is not None else (),
-        value_type: lambda x: type(x),
+        getvalues: _scalar_getvalues,
+        value_type: type,
         value_eq: _scalar_value_eq,
-        value_apply: lambda x, f: f(x)
+        value_apply: _scalar_value_apply
     }
 )
@@ -26,7 +26,23 @@ from efilter import syntax as s
 from efilter import ast
 
 
+# Exact source type -> syntax shorthand. Subclasses of these types (and of
+# ast.Expression) are handled by the isinstance checks in guess_source_syntax.
+_SYNTAX_BY_SOURCE_TYPE = dict((t, "dottysql") for t in six.string_types)
+_SYNTAX_BY_SOURCE_TYPE[tuple] = "lisp"
+
+# Syntax shorthand -> parser class / formatter. The registries are only ever
+# updated in place, so binding their lookups once is always current, even for
+# syntaxes registered (or re-registered) later.
+_get_parser = s.Syntax.FRONTENDS.get
+_get_formatter = s.Syntax.FORMATTERS.get
+
+
 def guess_source_syntax(source):
+    syntax = _SYNTAX_BY_SOURCE_TYPE.get(type(source))
+    if syntax:
+        return syntax
+
     if isinstance(source, ast.Expression):
         return "expression"
 
@@ -39,16 +55,52 @@ def guess_source_syntax(source):
     return None
 
 
+@six.python_2_unicode_compatible
 class Query(object):
-    source = None
-    root = None
-    syntax = None
-    application_delegate = None
-    params = None
+    # _source, _root: Backing slots of the 'source' and 'root' properties.
+    # _hash: Cached hash of 'root'. Hashing the AST walks the whole tree.
+    # _normalized: Cached result of normalize(self), set by the normalize
+    #     transform, which is a pure function of 'root'.
+    # _compiled: Cached function the solve transform compiled 'root' into.
+    #
+    # _normalized and _compiled are stored as (dispatch.registration_count(),
+    # value), so they're recomputed after new implementations are registered.
+    #
+    # Reassigning 'source' or 'root' discards the cached values.
+    __slots__ = ("_source", "_root", "syntax", "application_delegate",
+                 "params", "_hash", "_normalized", "_compiled")
+
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, source):
+        self._source = source
+        self._clear_caches()
+
+    @property
+    def root(self):
+        return self._root
+
+    @root.setter
+    def root(self, root):
+        self._root = root
+        self._clear_caches()
+
+    def _clear_caches(self):
+        self._hash = None
+        self._normalized = None
+        self._compiled = None
 
     def __init__(self, source, root=None, params=None, syntax=None,
                  application_delegate=None):
         super(Query, self).__init__()
+        self.source = None
+        self.root = None
+        self.syntax = None
+        self.application_delegate = None
+        self.params = None
 
         if isinstance(source, Query):
             # Run as a copy constructor with optional overrides.
@@ -87,7 +139,7 @@ class Query(object):
             if not self.syntax:
                 self.syntax = guess_source_syntax(self.source)
 
-            parser_cls = s.Syntax.get_syntax(self.syntax)
+            parser_cls = _get_parser(self.syntax)
             if not parser_cls:
                 raise ValueError(
                     "Cannot find parser for syntax %r. Source was %r." %
@@ -100,24 +152,27 @@ class Query(object):
                 # Good, fully expressive default.
                 self.syntax = "dottysql"
 
-            formatter = s.Syntax.get_formatter(self.syntax)
+            formatter = _get_formatter(self.syntax)
             if not formatter:
                 # If we don't have a formatter for the explicit syntax, just
                 # generate at least /something/.
-                formatter = s.Syntax.get_formatter("dottysql")
+                formatter = _get_formatter("dottysql")
             self.source = formatter(self.root)
 
     def __str__(self):
-        return unicode(self)
-
-    def __unicode__(self):
-        return unicode(self.source)
+        # On Python 2, python_2_unicode_compatible makes this __unicode__ and
+        # has __str__ return it encoded as UTF-8.
+        return six.text_type(self.source)
 
     def __repr__(self):
         return "Query(%s)" % repr(self.source)
 
     def __hash__(self):
-        return hash(self.root)
+        h = self._hash
+        if h is None:
+            h = self._hash = hash(self.root)
+
+        return h
 
     def __eq__(self, other):
         if not isinstance(other, Query):
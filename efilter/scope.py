@@ -20,11 +20,59 @@ EFILTER lexical scope container.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+import weakref
+
 from efilter import protocol
 
 from efilter.protocols import structured
 
 
+# How ScopeStack.__init__ handles a scope, by its type.
+_SCOPE_STACK = 0  # Another ScopeStack, which gets flattened.
+_SCOPE_TYPE = 1  # A type, used in type inference.
+_SCOPE_STRUCTURED = 2  # An instance of IStructured.
+
+# Cache of type(scope) -> one of the above. Protocol membership checks go
+# through the ABC machinery and are slow, and ScopeStacks get created for
+# every row a query visits, usually with the same few types of scopes.
+_SCOPE_KINDS = weakref.WeakKeyDictionary()
+
+
+def _classify_scope(scope):
+    """Return the _SCOPE_* constant for 'scope' or None if it's not valid."""
+    scope_type = type(scope)
+    kind = _SCOPE_KINDS.get(scope_type)
+    if kind is not None:
+        return kind
+
+    if isinstance(scope, ScopeStack):
+        kind = _SCOPE_STACK
+    elif isinstance(scope, type):
+        kind = _SCOPE_TYPE
+    elif protocol.implements(scope, structured.IStructured):
+        kind = _SCOPE_STRUCTURED
+    else:
+        # Don't cache this - the type may get registered with the protocol
+        # later.
+        return None
+
+    _SCOPE_KINDS[scope_type] = kind
+    return kind
+
+
+def _resolve_in(scope, name):
+    """Same as structured.resolve(scope, name), but cheaper to call.
+
+    ScopeStack.resolve runs for every var of every row a query visits, and
+    calls this for each scope it looks in.
+    """
+    resolver = structured.resolve.implementation_for_type(type(scope))
+    if resolver is None:
+        return structured.resolve(scope, name)
+
+    return resolver(scope, name)
+
+
 class ScopeStack(object):
     """Stack of IStructured scopes from global to local.
 
@@ -38,9 +86,28 @@ class ScopeStack(object):
             the individual scopes are usually instances of type, or whatever
             objects the host application uses to emulate types. When used at
             runtime, they are, of course, instances.
+
+    Caveat:
+        'reflect' remembers its results. Scopes are expected not to start
+        defining new types while the stack is in use - if they do, build a new
+        ScopeStack (or reassign 'scopes') so the stale results are discarded.
     """
 
-    scopes = ()
+    # _scopes: Backing list of the 'scopes' property.
+    # _rev_scopes: Same as 'scopes', but ordered from local to global, which is
+    #     the order in which resolution and reflection visit them.
+    # _reflect_cache: Dict of name -> result of 'reflect'.
+    __slots__ = ("_scopes", "_rev_scopes", "_reflect_cache")
+
+    @property
+    def scopes(self):
+        return self._scopes
+
+    @scopes.setter
+    def scopes(self, scopes):
+        self._scopes = scopes
+        self._rev_scopes = scopes[::-1]
+        self._reflect_cache = {}
 
     @property
     def globals(self):
@@ -56,15 +123,14 @@ class ScopeStack(object):
     def __init__(self, *scopes):
         flattened_scopes = []
         for scope in scopes:
-            if isinstance(scope, type(self)):
+            kind = _classify_scope(scope)
+            if kind == _SCOPE_STACK:
                 flattened_scopes.extend(scope.scopes)
-            elif isinstance(scope, type):
-                flattened_scopes.append(scope)
-            elif protocol.implements(scope, structured.IStructured):
-                flattened_scopes.append(scope)
-            else:
+            elif kind is None:
                 raise TypeError("Scopes must be instances or subclasses of "
                                 "IStructured; got %r." % (scope,))
+            else:
+                flattened_scopes.append(scope)
 
         self.scopes = flattened_scopes
 
@@ -72,9 +138,9 @@ class ScopeStack(object):
 
     def resolve(self, name):
         """Call IStructured.resolve across all scopes and return first hit."""
-        for scope in reversed(self.scopes):
+        for scope in self._rev_scopes:
             try:
-                return structured.resolve(scope, name)
+                return _resolve_in(scope, name)
             except (KeyError, AttributeError):
                 continue
 
@@ -92,14 +158,10 @@ class ScopeStack(object):
         Raises:
             NotImplementedError if any scope fails to implement 'getmembers'.
         """
-        names = set()
-        for scope in self.scopes:
-            if isinstance(scope, type):
-                names.update(structured.getmembers_static(scope))
-            else:
-                names.update(structured.getmembers_runtime(scope))
-
-        return names
+        return set().union(*[structured.getmembers_static(scope)
+                             if isinstance(scope, type)
+                             else structured.getmembers_runtime(scope)
+                             for scope in self.scopes])
 
     def getmembers_runtime(self):
         """Gets members (vars) from all scopes using ONLY runtime information.
@@ -112,14 +174,10 @@ class ScopeStack(object):
         Raises:
             NotImplementedError if any scope fails to implement 'getmembers'.
         """
-        names = set()
-        for scope in self.scopes:
-            names.update(structured.getmembers_runtime(scope))
-
-        return names
+        return set().union(*[structured.getmembers_runtime(scope)
+                             for scope in self.scopes])
 
-    @classmethod
-    def getmembers_static(cls):
+    def getmembers_static(self):
         """Gets members (vars) from all scopes using ONLY static information.
 
         You most likely want to use ScopeStack.getmembers instead.
@@ -130,11 +188,8 @@ class ScopeStack(object):
         Raises:
             NotImplementedError if any scope fails to implement 'getmembers'.
         """
-        names = set()
-        for scope in cls.scopes:
-            names.update(structured.getmembers_static(scope))
-
-        return names
+        return set().union(*[structured.getmembers_static(scope)
+                             for scope in self.scopes])
 
     def reflect(self, name):
         """Reflect 'name' starting with local scope all the way up to global.
@@ -151,10 +206,20 @@ class ScopeStack(object):
             through the reflection API. For example, Rekall uses objects
             generated at runtime to simulate a native (C/C++) type system.
         """
+        try:
+            return self._reflect_cache[name]
+        except KeyError:
+            pass
+
+        result = self._reflect(name)
+        self._reflect_cache[name] = result
+        return result
+
+    def _reflect(self, name):
         # Return whatever the most local scope defines this as, or bubble all
         # the way to the top.
         result = None
-        for scope in reversed(self.scopes):
+        for scope in self._rev_scopes:
             try:
                 if isinstance(scope, type):
                     result = structured.reflect_static_member(scope, name)
@@ -177,7 +242,7 @@ class ScopeStack(object):
         Returns:
             Type of 'name', or protocol.AnyType.
         """
-        for scope in reversed(self.scopes):
+        for scope in self._rev_scopes:
             try:
                 return structured.reflect_runtime_member(scope, name)
             except (NotImplementedError, KeyError, AttributeError):
@@ -185,8 +250,7 @@ class ScopeStack(object):
 
         return protocol.AnyType
 
-    @classmethod
-    def reflect_static_member(cls, name):
+    def reflect_static_member(self, name):
         """Reflect 'name' using ONLY static reflection.
 
         You most likely want to use ScopeStack.reflect instead.
@@ -194,7 +258,7 @@ class ScopeStack(object):
         Returns:
             Type of 'name', or protocol.AnyType.
         """
-        for scope in reversed(cls.scopes):
+        for scope in self._rev_scopes:
             try:
                 return structured.reflect_static_member(scope, name)
             except (NotImplementedError, KeyError, AttributeError):
@@ -27,7 +27,6 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 import itertools
 import six
-import threading
 
 from efilter import protocol
 
@@ -38,12 +37,39 @@ from efilter.protocols import repeated
 from efilter.protocols import structured
 
 
+# IApplicative implementation shared by TypedFunction and TypedReducer. These
+# call the methods directly, which is cheaper than the late dispatchers that
+# IApplicative.implicit_dynamic would generate, and still honors overrides in
+# subclasses.
+
+
+def _apply(func, args, kwargs):
+    return func.apply(args, kwargs)
+
+
+def _reflect_static_args(cls):
+    return cls.reflect_static_args()
+
+
+def _reflect_static_return(cls):
+    return cls.reflect_static_return()
+
+
+_APPLICATIVE_IMPLEMENTATIONS = {
+    applicative.apply: _apply,
+    applicative.reflect_static_args: _reflect_static_args,
+    applicative.reflect_static_return: _reflect_static_return
+}
+
+
 class TypedFunction(object):
     """Represents an EFILTER-callable function with reflection support.
 
     Each function in the standard library is an instance of a subclass of
     this class. Subclasses override __call__ and the reflection API.
     """
+    __slots__ = ()
+
     name = None
 
     def apply(self, args, kwargs):
@@ -61,7 +87,9 @@ class TypedFunction(object):
         return protocol.AnyType
 
 
-applicative.IApplicative.implicit_dynamic(TypedFunction)
+applicative.IApplicative.implement(
+    for_type=TypedFunction,
+    implementations=_APPLICATIVE_IMPLEMENTATIONS)
 
 
 class TypedReducer(object):
@@ -70,6 +98,8 @@ class TypedReducer(object):
     TypedReducer supports the IReducer protocol, but also works as a function
     (IApplicative), to allow it to reduce values inside rows in a query.
     """
+    __slots__ = ()
+
     name = None
 
     # IApplicative
@@ -100,7 +130,9 @@ class TypedReducer(object):
         raise NotImplementedError()
 
 
-applicative.IApplicative.implicit_dynamic(TypedReducer)
+applicative.IApplicative.implement(
+    for_type=TypedReducer,
+    implementations=_APPLICATIVE_IMPLEMENTATIONS)
 reducer.IReducer.implicit_dynamic(TypedReducer)
 
 
@@ -140,45 +172,36 @@ class LibraryModule(object):
     such as 'str' or 'int', in addition to functions.
     """
 
-    vars = None
-    name = None
+    # _members: Frozen set of names in 'vars'. Modules are immutable once
+    #     created.
+    # _member_types: Dict of name -> type of the var, for reflection.
+    __slots__ = ("vars", "name", "_members", "_member_types")
 
     # This is a class-level global storing all instances by their name.
     ALL_MODULES = {}
-    _all_modules_lock = threading.Lock()
 
     def __init__(self, vars, name):
         self.vars = vars
         self.name = name
+        self._members = frozenset(vars)
+        self._member_types = dict((k, type(v)) for k, v in six.iteritems(vars))
 
-        self._all_modules_lock.acquire()
-        try:
-            if name in self.ALL_MODULES:
-                raise ValueError("Duplicate module name %r." % name)
-
-            self.ALL_MODULES[name] = self
-        finally:
-            self._all_modules_lock.release()
-
-    def __del__(self):
-        """If modules are being used properly this will only happen on exit."""
-        self._all_modules_lock.acquire()
-        try:
-            del self.ALL_MODULES[self.name]
-        finally:
-            self._all_modules_lock.release()
+        # setdefault is atomic, so this needs no lock. Modules stay registered
+        # for the lifetime of the process.
+        if self.ALL_MODULES.setdefault(name, self) is not self:
+            raise ValueError("Duplicate module name %r." % name)
 
     def __repr__(self):
         return "LibraryModule(name=%r, vars=%r)" % (self.name, self.vars)
 
     def getmembers_runtime(self):
-        return self.vars.keys()
+        return self._members
 
     def resolve(self, name):
         return self.vars[name]
 
     def reflect_runtime_member(self, name):
-        return type(self.vars[name])
+        return self._member_types[name]
 
 
 structured.IStructured.implicit_static(LibraryModule)
@@ -190,8 +213,7 @@ class First(TypedFunction):
     name = "first"
 
     def __call__(self, x):
-        for value in repeated.getvalues(x):
-            return value
+        return next(iter(repeated.getvalues(x)), None)
 
     @classmethod
     def reflect_static_args(cls):
@@ -205,7 +227,7 @@ class First(TypedFunction):
 class Take(TypedFunction):
     """Take only the first 'count' elements from 'x' (tuple or IRepeated).
 
-    This implementation is lazy.
+    This implementation is lazy, except for tuples, which are sliced eagerly.
 
     Example:
         take(2, (1, 2, 3, 4)) -> (1, 2)
@@ -221,19 +243,21 @@ class Take(TypedFunction):
     name = "take"
 
     def __call__(self, count, x):
-        def _generator():
-            if isinstance(x, tuple):
-                values = x
-            else:
-                values = repeated.getvalues(x)
+        if count < 0:
+            # A negative count never runs out, so everything is taken.
+            count = None
 
-            for idx, value in enumerate(values):
-                if idx == count:
-                    break
-
-                yield value
+        if isinstance(x, tuple):
+            # Slice eagerly, since the tuple is already in memory, but still
+            # return a repeated value: melding would turn a single element into
+            # a scalar and skip over Nones.
+            values = x[:count]
+            return repeated.lazy(lambda: iter(values))
 
-        return repeated.lazy(_generator)
+        # Lazy repeated values can only be iterated once per getvalues call,
+        # so we must call it every time the generator restarts.
+        return repeated.lazy(
+            lambda: itertools.islice(repeated.getvalues(x), count))
 
     @classmethod
     def reflect_static_args(cls):
@@ -247,7 +271,7 @@ class Take(TypedFunction):
 class Drop(TypedFunction):
     """Drop the first 'count' elements from 'x' (tuple or IRepeated).
 
-    This implementation is lazy.
+    This implementation is lazy, except for tuples, which are sliced eagerly.
 
     Example:
         drop(2, (1, 2, 3, 4)) -> (3, 4)
@@ -263,19 +287,19 @@ class Drop(TypedFunction):
     name = "drop"
 
     def __call__(self, count, x):
-        def _generator():
-            if isinstance(x, tuple):
-                values = x
-            else:
-                values = repeated.getvalues(x)
+        if count < 0:
+            # Nothing comes before the first element, so nothing is dropped.
+            count = 0
 
-            for idx, value in enumerate(values):
-                if idx < count:
-                    continue
-
-                yield value
+        if isinstance(x, tuple):
+            # Slicing skips the dropped prefix without iterating it. See
+            # Take.__call__ for why this isn't melded.
+            values = x[count:]
+            return repeated.lazy(lambda: iter(values))
 
-        return repeated.lazy(_generator)
+        # See Take.__call__ for why getvalues is called in the closure.
+        return repeated.lazy(
+            lambda: itertools.islice(repeated.getvalues(x), count, None))
 
     @classmethod
     def reflect_static_args(cls):
@@ -291,9 +315,22 @@ class Lower(TypedFunction):
 
     name = "lower"
 
+    _text_lower = six.text_type.lower
+
     def __call__(self, x):
+        if type(x) is six.text_type:
+            return Lower._text_lower(x)
+
+        # Byte strings (and Python 2 str) have their own lower.
         return x.lower()
 
+    def apply(self, args, kwargs):
+        # Queries call this once per row, so skip the extra __call__ frame.
+        if len(args) == 1 and not kwargs:
+            return args[0].lower()
+
+        return self(*args, **kwargs)
+
     @classmethod
     def reflect_static_args(cls):
         return (six.string_types[0],)
@@ -311,6 +348,13 @@ class Find(TypedFunction):
     def __call__(self, string, needle):
         return string.find(needle)
 
+    def apply(self, args, kwargs):
+        # See Lower.apply.
+        if len(args) == 2 and not kwargs:
+            return args[0].find(args[1])
+
+        return self(*args, **kwargs)
+
     @classmethod
     def reflect_static_args(cls):
         return (six.string_types[0], six.string_types[0])
@@ -346,9 +390,14 @@ class Reverse(TypedFunction):
 
     def __call__(self, x):
         if isinstance(x, tuple):
-            return tuple(reversed(x))
+            return x[::-1]
+
+        values = repeated.getvalues(x)
+        if not isinstance(values, (list, tuple)):
+            # Lazy values need to be materialized before they can be reversed.
+            values = list(values)
 
-        return repeated.meld(*reversed(repeated.getvalues(x)))
+        return repeated.meld_iter(values[::-1])
 
     @classmethod
     def reflect_static_args(cls):
@@ -20,10 +20,10 @@
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+import operator
 import six
 from six.moves import xrange
 
-from efilter.protocols import counted
 from efilter.protocols import number
 from efilter.stdlib import core
 
@@ -31,12 +31,124 @@ from efilter.stdlib import core
 # Analytical functions:
 
 
+# Longest 'x' for which LevenshteinDistance uses _myers_distance. Python ints
+# are arbitrary-precision, but past a machine word or so the bitwise ops stop
+# being cheap.
+_MYERS_MAX_LENGTH = 64
+
+# Memoized results of LevenshteinDistance, keyed on (shorter, longer) string.
+# Queries often compare the same column value to the same literal on many
+# rows. The cache is cleared when it fills up, and only short strings are
+# cached, which keeps its memory use bounded.
+_LEVENSHTEIN_CACHE = {}
+_LEVENSHTEIN_CACHE_SIZE = 4096
+_LEVENSHTEIN_CACHE_MAX_LENGTH = 256
+
+# Hashable string types that are safe to use as cache keys.
+_LEVENSHTEIN_CACHE_TYPES = (six.text_type, six.binary_type)
+
+
+def _myers_distance(x, y):
+    """Levenshtein distance between 'x' and 'y' using Myers' algorithm.
+
+    This is the bit-parallel formulation (Myers 1999, as adapted for edit
+    distance by Hyyro 2001): each DP column is encoded as bitvectors of
+    vertical +1/-1 deltas, one bit per character of 'x', so a whole column is
+    updated with a handful of bitwise operations.
+
+    'x' must be non-empty and should be the shorter string.
+    """
+    # peq[c] has bit i set wherever x[i] == c.
+    peq = {}
+    bit = 1
+    for c in x:
+        peq[c] = peq.get(c, 0) | bit
+        bit <<= 1
+
+    mask = bit - 1
+    last = bit >> 1
+    vp = mask
+    vn = 0
+    score = len(x)
+
+    for c in y:
+        eq = peq.get(c, 0)
+        xv = eq | vn
+        d0 = (((xv & vp) + vp) ^ vp) | xv
+        hp = vn | ~(d0 | vp)
+        hn = vp & d0
+
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+
+        hp = (hp << 1) | 1
+        vp = ((hn << 1) | ~(d0 | hp)) & mask
+        vn = hp & d0 & mask
+
+    return score
+
+
+def _levenshtein(x, y):
+    """Levenshtein distance between 'x' and 'y'; 'x' must not be longer.
+
+    This is the hot loop of LevenshteinDistance, kept as a plain function so
+    it can be swapped for faster implementations for some inputs.
+    """
+    lx = len(x)
+
+    # Conceptually, this is a matrix of edit distances between prefixes of
+    # x and y, arranged so that every coordinate pair into the matrix is
+    # the levenshtein distance between the first 'j' characters of 'x' and
+    # first 'i' characters of 'y'. To compute the distance from x to y we
+    # need all intermediate results, but only one row at a time: it's updated
+    # in place, with the one value from the previous row that gets overwritten
+    # before it's needed kept in 'prev_diag'.
+
+    # The first row of edit distances: an empty string can be transformed
+    # into a string of length N in N steps.
+    row = list(xrange(lx + 1))
+
+    # Iterating the strings (rather than indexing them inside the loops) gets
+    # each character just once per pass.
+    for i, y_char in enumerate(y, 1):
+        prev_diag = row[0]
+        row[0] = left = i
+
+        for j, x_char in enumerate(x, 1):
+            # One of three operations will have to lowest cost: substitution
+            # (or nop) from 'prev_diag', deletion from 'above' and insertion
+            # from 'left'. Neighboring cells differ by at most one, so on a
+            # match the nop always wins. The comparisons below are the same as
+            # calling min(), but much cheaper.
+            above = row[j]
+            if x_char == y_char:
+                left = prev_diag
+            else:
+                if above < left:
+                    left = above
+
+                if prev_diag < left:
+                    left = prev_diag
+
+                left += 1
+
+            row[j] = left
+            prev_diag = above
+
+    return row[-1]
+
+
 class LevenshteinDistance(core.TypedFunction):
     """Compute Levenshtein distance between 'x' and 'y'.
 
     Levenshtein distance is, informally, the number of insert/delete/substitute
-    operations needed to transform 'x' to 'y'. Computing the distance takes
-    O(N * M) steps using the bottom-up dynamic programming approach below.
+    operations needed to transform 'x' to 'y'. If the shorter of the two has
+    at most 64 elements, which are hashable, the distance is computed with
+    Myers' bit-parallel algorithm in O(M) word operations. Otherwise it takes
+    O(N * M) steps using the bottom-up dynamic programming approach in
+    _levenshtein.
 
     See: https://en.wikipedia.org/wiki/Levenshtein_distance.
     """
@@ -55,38 +167,40 @@ class LevenshteinDistance(core.TypedFunction):
             return lx
 
         if lx > ly:
-            # This saves space, because the rows are shorter.
-            return self(y, x)
-
-        # Conceptually, this is a matrix of edit distances between prefixes of
-        # x and y, arranged so that every coordinate pair into the matrix is
-        # the levenshtein distance between the first 'i' characters of 'x' and
-        # first 'j' characters of 'y'. To compute the distance from x to y we
-        # need all intermediate results, but only the last two rows at a time.
-
-        # The first row of edit distances: an empty string can be transformed
-        # into a string of length N in N steps.
-        current_row = list(xrange(lx))
-
-        for i in xrange(1, ly):
-            previous_row = current_row
-            current_row = [0] * lx
-            current_row[0] = i
-
-            for j in xrange(1, lx):
-                if x[j - 1] == y[i - 1]:
-                    substitution_cost = 0
-                else:
-                    substitution_cost = 1
-
-                # One of three operations will have to lowest cost. They are,
-                # in order, substitution (or nop), deletion and insertion.
-                current_row[j] = min(
-                    previous_row[j - 1] + substitution_cost,
-                    previous_row[j] + 1,
-                    current_row[j - 1] + 1)
-
-        return current_row[-1]
+            # This saves space, because the row is shorter.
+            x, y = y, x
+            lx, ly = ly, lx
+
+        if (ly > _LEVENSHTEIN_CACHE_MAX_LENGTH
+                or type(x) not in _LEVENSHTEIN_CACHE_TYPES
+                or type(y) not in _LEVENSHTEIN_CACHE_TYPES):
+            return self._distance(x, y)
+
+        key = (x, y)
+        try:
+            return _LEVENSHTEIN_CACHE[key]
+        except KeyError:
+            pass
+
+        result = self._distance(x, y)
+        if len(_LEVENSHTEIN_CACHE) >= _LEVENSHTEIN_CACHE_SIZE:
+            _LEVENSHTEIN_CACHE.clear()
+
+        _LEVENSHTEIN_CACHE[key] = result
+        return result
+
+    @staticmethod
+    def _distance(x, y):
+        """Uncached distance; 'x' must be non-empty and not longer than 'y'."""
+        if len(x) <= _MYERS_MAX_LENGTH:
+            try:
+                return _myers_distance(x, y)
+            except TypeError:
+                # Myers' algorithm indexes the elements in a dict, but the DP
+                # loop only compares them, so unhashable ones still work there.
+                pass
+
+        return _levenshtein(x, y)
 
     @classmethod
     def reflect_static_args(cls):
@@ -105,7 +219,20 @@ class Mean(core.TypedReducer):
     name = "mean"
 
     def fold(self, chunk):
-        return (sum(chunk), counted.count(chunk))
+        if isinstance(chunk, (list, tuple)):
+            # This is what 'reduce' passes us - sum runs in C and len is free,
+            # so skip the ICounted dispatch.
+            return (sum(chunk), len(chunk))
+
+        # Anything else (like a lazy repeated value) might be expensive to walk
+        # or only walkable once, so sum and count in the same pass.
+        total = 0
+        count = 0
+        for value in chunk:
+            total += value
+            count += 1
+
+        return (total, count)
 
     def merge(self, left, right):
         return (left[0] + right[0], left[1] + right[1])
@@ -145,15 +272,17 @@ class VectorSum(core.TypedReducer):
 
     def fold(self, chunk):
         iterator = iter(chunk)
-        running_sum = list(next(chunk))
+        running_sum = list(next(iterator))
         expected_len = len(running_sum)
         for row in iterator:
             if len(row) != expected_len:
                 raise ValueError(
                     "vector_sum can only add up vectors of same size.")
 
-            for idx, col in enumerate(row):
-                running_sum[idx] += col
+            # Adds up the whole row in one C-level loop.
+            running_sum = list(map(operator.add, running_sum, row))
+
+        return running_sum
 
     def merge(self, left, right):
         return self.fold([left, right])
@@ -171,6 +300,7 @@ MODULE = core.LibraryModule(
     vars={
         Mean.name: Mean(),
         Sum.name: Sum(),
+        VectorSum.name: VectorSum(),
         LevenshteinDistance.name: LevenshteinDistance()
     }
 )
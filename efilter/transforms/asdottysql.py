@@ -21,6 +21,7 @@ EFILTER DottySQL syntax output.
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
 import six
+import threading
 
 from efilter import dispatch
 from efilter import ast
@@ -32,13 +33,87 @@ from efilter.parsers.dottysql import grammar
 
 BUILTINS = dict((v, k) for k, v in six.iteritems(grammar.BUILTINS))
 
+# The grammar is fixed at import, so look up operators the formatter needs once
+# instead of on every node.
+OPERATORS = grammar.OPERATORS.by_handler
+_RESOLVE = OPERATORS[ast.Resolve]
+_PAIR = grammar.OPERATORS.by_name[":"]
+_NOT_EQUIVALENT = grammar.OPERATORS.by_name["!="]
+_NOT_MEMBER = grammar.OPERATORS.by_name["not in"]
+
+# Dict of handler type -> (precedence, assoc) of its operator, so that the
+# formatter needs just one dict lookup per child to decide on parens.
+_PRECEDENCE = dict((handler, (operator.precedence, operator.assoc))
+                   for handler, operator in six.iteritems(OPERATORS))
+_NO_PRECEDENCE = (None, None)
+
+# Dict of handler type -> its operator with a space on either side, which is
+# what goes between the operands of infix operators.
+_SEPARATORS = dict((handler, " " + operator.name + " ")
+                   for handler, operator in six.iteritems(OPERATORS))
+
 
 def __expression_precedence(expr):
-    operator = grammar.OPERATORS.by_handler.get(type(expr))
-    if operator:
-        return operator.precedence, operator.assoc
+    return _PRECEDENCE.get(type(expr), _NO_PRECEDENCE)
+
+
+# Holds 'memo' while format_dottysql runs: a dict of id(subexpression) ->
+# (subexpression, its output). Keeping the subexpression in the value keeps it
+# alive, so its id can't be reused by another node while the memo is in use,
+# even if a handler formats temporary subexpressions. Thread-local, so threads
+# formatting queries at the same time each get their own.
+_LOCAL = threading.local()
+
 
-    return None, None
+def _dispatch(expr):
+    """Same as asdottysql(expr), but cheaper to call for every node.
+
+    The lookup goes through the multimethod's own cache, so implementations
+    registered later are picked up.
+    """
+    handler = asdottysql.implementation_for_type(type(expr))
+    if handler is None:
+        # Let the multimethod raise the usual error.
+        return asdottysql(expr)
+
+    return handler(expr)
+
+
+def _format(expr):
+    """Format a subexpression of the node being formatted.
+
+    Queries built programmatically often share the same subexpression instance
+    between several parents. Inside format_dottysql, each instance is only
+    formatted once.
+    """
+    memo = getattr(_LOCAL, "memo", None)
+    if memo is None:
+        return _dispatch(expr)
+
+    key = id(expr)
+    entry = memo.get(key)
+    if entry is not None and entry[0] is expr:
+        return entry[1]
+
+    result = _dispatch(expr)
+    memo[key] = (expr, result)
+    return result
+
+
+def format_dottysql(expr):
+    """Same as asdottysql, but formats shared subexpressions only once.
+
+    This is the registered 'dottysql' formatter.
+    """
+    if getattr(_LOCAL, "memo", None) is not None:
+        # Already inside a call - keep using the outer memo.
+        return asdottysql(expr)
+
+    _LOCAL.memo = {}
+    try:
+        return asdottysql(expr)
+    finally:
+        _LOCAL.memo = None
 
 
 @dispatch.multimethod
@@ -53,7 +128,7 @@ def asdottysql(expr):
 
 @asdottysql.implementation(for_type=q.Query)
 def asdottysql(query):
-    return asdottysql(query.root)
+    return _format(query.root)
 
 
 @asdottysql.implementation(for_types=(ast.Within, ast.Cast, ast.Reducer))
@@ -61,20 +136,20 @@ def asdottysql_builtin(expr):
     if not type(expr) in BUILTINS:
         return "<Subexpression cannot be formatted as DottySQL.>"
 
-    body = ", ".join([asdottysql(x) for x in expr.children])
-    return "%s(%s)" % (BUILTINS[type(expr)], body)
+    body = ", ".join(map(_format, expr.children))
+    return BUILTINS[type(expr)] + "(" + body + ")"
 
 
 @asdottysql.implementation(for_type=ast.Map)
 def asdottysql_map(expr):
-    lhs = asdottysql(expr.lhs)
-    rhs = asdottysql(expr.rhs)
+    lhs = _format(expr.lhs)
+    rhs = _format(expr.rhs)
 
     if (isinstance(expr.lhs, (ast.Map, ast.Var))
             and isinstance(expr.rhs, (ast.Map, ast.Var))):
-        return "%s.%s" % (lhs, rhs)
+        return lhs + "." + rhs
 
-    return "map(%s, %s)" % (lhs, rhs)
+    return "map(" + lhs + ", " + rhs + ")"
 
 
 @asdottysql.implementation(for_type=ast.Let)
@@ -86,46 +161,45 @@ def asdottysql_let(expr):
     for pair in expr.lhs.children:
         if not isinstance(pair.lhs, ast.Literal):
             return "<Non-literal binding names cannot be formatted as DottySQL>"
-        pairs.append("%s = %s" % (pair.lhs.value, asdottysql(pair.rhs)))
+        pairs.append("%s = %s" % (pair.lhs.value, _format(pair.rhs)))
 
-    return "let(%s) %s" % (", ".join(pairs), asdottysql(expr.rhs))
+    return "let(%s) %s" % (", ".join(pairs), _format(expr.rhs))
 
 
 @asdottysql.implementation(for_types=(ast.NumericExpression, ast.Relation,
                                       ast.LogicalOperation))
 def asdottysql_operator(expr):
-    operator = grammar.OPERATORS.by_handler[type(expr)]
+    own_precedence, _ = _PRECEDENCE[type(expr)]
     children = []
 
     for child in expr.children:
         precedence, _ = __expression_precedence(child)
 
-        if precedence is not None and precedence < operator.precedence:
-            children.append("(%s)" % asdottysql(child))
+        if precedence is not None and precedence < own_precedence:
+            children.append("(" + _format(child) + ")")
         else:
-            children.append(asdottysql(child))
+            children.append(_format(child))
 
-    separator = " %s " % operator.name
-    return separator.join(children)
+    return _SEPARATORS[type(expr)].join(children)
 
 
 def _format_binary(lhs, rhs, operator, lspace=" ", rspace=" "):
-    left = asdottysql(lhs)
-    right = asdottysql(rhs)
+    left = _format(lhs)
+    right = _format(rhs)
 
     lhs_precedence, lassoc = __expression_precedence(lhs)
     if lassoc == "left" and lhs_precedence is not None:
         lhs_precedence += 1
 
     if lhs_precedence is not None and lhs_precedence < operator.precedence:
-        left = "(%s)" % left
+        left = "(" + left + ")"
 
     rhs_precedence, rassoc = __expression_precedence(rhs)
     if rassoc == "right" and rhs_precedence is not None:
         rhs_precedence += 1
 
     if rhs_precedence is not None and rhs_precedence < operator.precedence:
-        right = "(%s)" % right
+        right = "(" + right + ")"
 
     return "".join((left, lspace, operator.name, rspace, right))
 
@@ -136,41 +210,39 @@ def asdottysql(expr):
             and len(expr.value.children) == 2):
         return _format_binary(expr.value.children[0],
                               expr.value.children[1],
-                              grammar.OPERATORS.by_name["!="])
+                              _NOT_EQUIVALENT)
 
     if isinstance(expr.value, ast.Membership):
         return _format_binary(expr.value.children[0],
                               expr.value.children[1],
-                              grammar.OPERATORS.by_name["not in"])
+                              _NOT_MEMBER)
 
     child_precedence, assoc = __expression_precedence(expr.value)
+    own_precedence, _ = __expression_precedence(expr)
 
     if assoc == "left" and child_precedence:
         child_precedence += 1
 
-    if (child_precedence is not None
-            and child_precedence < __expression_precedence(expr)[0]):
-        return "not (%s)" % asdottysql(expr.value)
+    if child_precedence is not None and child_precedence < own_precedence:
+        return "not (" + _format(expr.value) + ")"
 
-    return "not %s" % asdottysql(expr.value)
+    return "not " + _format(expr.value)
 
 
 @asdottysql.implementation(for_type=ast.Bind)
 def asdottysql(expr):
-    return "bind(%s)" % ", ".join(asdottysql(x) for x in expr.children)
+    return "bind(%s)" % ", ".join(map(_format, expr.children))
 
 
 @asdottysql.implementation(for_type=ast.Pair)
 def asdottysql(expr):
-    return _format_binary(expr.lhs, expr.rhs, grammar.OPERATORS.by_name[":"],
-                          lspace="")
+    return _format_binary(expr.lhs, expr.rhs, _PAIR, lspace="")
 
 
 @asdottysql.implementation(for_types=(ast.IsInstance, ast.RegexFilter,
                                       ast.Membership))
 def asdottysql(expr):
-    return _format_binary(expr.lhs, expr.rhs,
-                          grammar.OPERATORS.by_handler[type(expr)])
+    return _format_binary(expr.lhs, expr.rhs, OPERATORS[type(expr)])
 
 
 @asdottysql.implementation(for_type=ast.Apply)
@@ -178,21 +250,21 @@ def asdottysql(expr):
     arguments = iter(expr.children)
     func = next(arguments)
 
-    return "%s(%s)" % (asdottysql(func),
-                       ", ".join([asdottysql(arg) for arg in arguments]))
+    return (_format(func) + "(" +
+            ", ".join(map(_format, arguments)) + ")")
 
 
 @asdottysql.implementation(for_type=ast.Select)
 def asdottysql(expr):
     arguments = iter(expr.children)
-    source = asdottysql(next(arguments))
+    source = _format(next(arguments))
 
     if not isinstance(expr.lhs, (ast.ValueExpression, ast.Repeat, ast.Tuple,
                                  ast.Map, ast.Select, ast.Apply, ast.Bind)):
-        source = "(%s)" % source
+        source = "(" + source + ")"
 
-    return "%s[%s]" % (source,
-                       ", ".join([asdottysql(arg) for arg in arguments]))
+    return (source + "[" +
+            ", ".join(map(_format, arguments)) + "]")
 
 
 @asdottysql.implementation(for_type=ast.Resolve)
@@ -200,24 +272,40 @@ def asdottysql(expr):
     if not isinstance(expr.rhs, ast.Literal):
         return "<expression cannot be formatted as DottySQL>"
 
-    return _format_binary(expr.lhs, ast.Var(expr.rhs.value),
-                          grammar.OPERATORS.by_handler[ast.Resolve], lspace="",
-                          rspace="")
+    # Dotted paths (x.y.z) parse as left-deep chains of Resolve. Walk down the
+    # chain in a loop, instead of recursing once per member, and join the
+    # members once at the end.
+    members = []
+    while type(expr) is ast.Resolve and isinstance(expr.rhs, ast.Literal):
+        members.append(expr.rhs.value)
+        expr = expr.lhs
+
+    base = _format(expr)
+    precedence, assoc = __expression_precedence(expr)
+    if assoc == "left" and precedence is not None:
+        precedence += 1
+
+    if precedence is not None and precedence < _RESOLVE.precedence:
+        base = "(" + base + ")"
+
+    members.append(base)
+    members.reverse()
+    return _RESOLVE.name.join(members)
 
 
 @asdottysql.implementation(for_type=ast.Repeat)
 def asdottysql(expr):
-    return "(%s)" % ", ".join(asdottysql(x) for x in expr.children)
+    return "(%s)" % ", ".join(map(_format, expr.children))
 
 
 @asdottysql.implementation(for_type=ast.Tuple)
 def asdottysql(expr):
-    return "[%s]" % ", ".join(asdottysql(x) for x in expr.children)
+    return "[%s]" % ", ".join(map(_format, expr.children))
 
 
 @asdottysql.implementation(for_type=ast.IfElse)
 def asdottysql(expr):
-    branches = ["if %s then %s" % (asdottysql(c), asdottysql(v))
+    branches = ["if %s then %s" % (_format(c), _format(v))
                 for c, v in expr.conditions()]
 
     if_ = " else ".join(branches)
@@ -226,7 +314,7 @@ def asdottysql(expr):
     if not else_ or else_ == ast.Literal(None):
         return if_
 
-    return "%s else %s" % (if_, asdottysql(else_))
+    return "%s else %s" % (if_, _format(else_))
 
 
 @asdottysql.implementation(for_type=ast.Literal)
@@ -239,4 +327,5 @@ def asdottysql(expr):
     return expr.value
 
 
-syntax.Syntax.register_formatter(shorthand="dottysql", formatter=asdottysql)
+syntax.Syntax.register_formatter(shorthand="dottysql",
+                                 formatter=format_dottysql)
@@ -43,10 +43,35 @@ def aslisp(expr):
 syntax.Syntax.register_formatter(shorthand="lisp", formatter=aslisp)
 
 
+def _aslisp(expr):
+    """Same as aslisp(expr), but calls the implementation directly.
+
+    This skips the multimethod's dispatch overhead for every child node. The
+    lookup goes through the multimethod's own cache, so implementations
+    registered later are picked up.
+    """
+    expr_type = type(expr)
+
+    # Leaves are about half of all nodes, so handle them inline. These must
+    # agree with the Literal and Var implementations below.
+    if expr_type is ast.Literal:
+        return expr.value
+
+    if expr_type is ast.Var:
+        return ("var", expr.value)
+
+    handler = aslisp.implementation_for_type(expr_type)
+    if handler is None:
+        # Let the multimethod raise the usual error.
+        return aslisp(expr)
+
+    return handler(expr)
+
+
 @aslisp.implementation(for_type=ast.Expression)
 def aslisp(expr):
     expr_name = EXPRESSIONS[type(expr)]
-    return tuple([expr_name] + [aslisp(child) for child in expr.children])
+    return tuple([expr_name] + [_aslisp(child) for child in expr.children])
 
 
 @aslisp.implementation(for_type=ast.Literal)
@@ -61,4 +86,4 @@ def aslisp(expr):
 
 @aslisp.implementation(for_type=q.Query)
 def aslisp(query):
-    return aslisp(query.root)
+    return _aslisp(query.root)
@@ -20,6 +20,8 @@ EFILTER query type inference.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+import threading
+
 from efilter import ast
 from efilter import dispatch
 from efilter import errors
@@ -57,6 +59,75 @@ def infer_type(expr, scope=None):
     raise NotImplementedError()
 
 
+# Holds 'memo' while infer_type runs on a query: a dict of
+# (id(expr), id(scope)) -> (expr, scope, type), and of the scopes built by
+# _nested_scope. Keeping expr and scope in the value keeps them alive, so their
+# ids can't be reused by other objects while the memo is in use. Thread-local,
+# so concurrent calls each get their own.
+_LOCAL = threading.local()
+
+
+# Dict of leaf-like expression type -> function returning its type.
+_CONSTANT_TYPES = {
+    ast.Literal: lambda expr: type(expr.value),
+    ast.Complement: lambda expr: bool,
+    ast.IsInstance: lambda expr: bool,
+}
+
+
+def _infer(expr, scope):
+    """Infer the type of a subexpression.
+
+    Inside a call to infer_type on a query, each subexpression is only
+    inferred once per scope, even if several parents share it.
+    """
+    expr_type = type(expr)
+    if expr_type in _CONSTANT_TYPES:
+        # The type of these doesn't depend on scope or children, so don't
+        # bother with the memo or dispatch. Must agree with the implementations
+        # below.
+        return _CONSTANT_TYPES[expr_type](expr)
+
+    memo = getattr(_LOCAL, "memo", None)
+    if memo is None:
+        return infer_type(expr, scope)
+
+    key = (id(expr), id(scope))
+    entry = memo.get(key)
+    if entry is not None:
+        return entry[2]
+
+    result = infer_type(expr, scope)
+    memo[key] = (expr, scope, result)
+    return result
+
+
+def _nested_scope(scope, t):
+    """Return ScopeStack(scope, t), reusing it within a call on a query.
+
+    Reusing the same ScopeStack for the same (scope, t) lets both the memo
+    and ScopeStack's own reflection cache hit for expressions under it.
+    """
+    memo = getattr(_LOCAL, "memo", None)
+    if memo is None:
+        return s.ScopeStack(scope, t)
+
+    try:
+        key = ("scope", id(scope), t)
+        entry = memo.get(key)
+    except TypeError:
+        # Host applications may use unhashable objects as types.
+        return s.ScopeStack(scope, t)
+
+    if entry is not None:
+        return entry[1]
+
+    # Keep 'scope' alive as well, for the same reason as in _infer.
+    nested = s.ScopeStack(scope, t)
+    memo[key] = (scope, nested)
+    return nested
+
+
 @infer_type.implementation(for_type=q.Query)
 def infer_type(query, scope=None):
     # Always include stdcore at the top level.
@@ -65,11 +136,18 @@ def infer_type(query, scope=None):
     else:
         scope = s.ScopeStack(std_core.MODULE)
 
+    outer_memo = getattr(_LOCAL, "memo", None)
+    if outer_memo is None:
+        _LOCAL.memo = {}
+
     try:
-        return infer_type(query.root, scope)
+        return _infer(query.root, scope)
     except errors.EfilterError as error:
         error.query = query.source
         raise
+    finally:
+        if outer_memo is None:
+            _LOCAL.memo = None
 
 
 @infer_type.implementation(for_type=ast.Literal)
@@ -113,7 +191,7 @@ def infer_type(expr, scope):
     else:
         return protocol.AnyType
 
-    container_type = infer_type(expr.value, scope)
+    container_type = _infer(expr.value, scope)
 
     try:
         # Associative types are not subject to scoping rules so we can just
@@ -132,7 +210,7 @@ def infer_type(expr, scope):
     else:
         return protocol.AnyType
 
-    container_type = infer_type(expr.obj, scope)
+    container_type = _infer(expr.obj, scope)
 
     try:
         # We are not using lexical scope here on purpose - we want to see what
@@ -150,7 +228,7 @@ def infer_type(expr, scope):
 
 @infer_type.implementation(for_type=ast.Apply)
 def infer_type(expr, scope):
-    func_type = infer_type(expr.func, scope)
+    func_type = _infer(expr.func, scope)
 
     try:
         return applicative.reflect_return(func_type) or protocol.AnyType
@@ -161,23 +239,23 @@ def infer_type(expr, scope):
 @infer_type.implementation(for_type=ast.Repeat)
 def infer_type(expr, scope):
     """Check the type of the repeated value (all members have the same type.)"""
-    return infer_type(expr.children[0], scope)
+    return _infer(expr.children[0], scope)
 
 
 @infer_type.implementation(for_type=ast.Map)
 def infer_type(expr, scope):
-    t = infer_type(expr.context, scope)
-    return infer_type(expr.expression, s.ScopeStack(scope, t))
+    t = _infer(expr.context, scope)
+    return _infer(expr.expression, _nested_scope(scope, t))
 
 
 @infer_type.implementation(for_type=ast.Filter)
 def infer_type(expr, scope):
-    return infer_type(expr.lhs, scope)
+    return _infer(expr.lhs, scope)
 
 
 @infer_type.implementation(for_type=ast.Sort)
 def infer_type(expr, scope):
-    return infer_type(expr.lhs, scope)
+    return _infer(expr.lhs, scope)
 
 
 @infer_type.implementation(for_type=ast.Any)
@@ -21,6 +21,8 @@ EFILTER query normalizer.
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
 
+import threading
+
 from efilter import dispatch
 from efilter import ast
 from efilter import query as q
@@ -51,39 +53,53 @@ def normalize(expr):
 
 @normalize.implementation(for_type=q.Query)
 def normalize(query):
-    new_root = normalize(query.root)
-    return q.Query(query, root=new_root)
+    # Cached results are only valid until an implementation is registered.
+    registrations = dispatch.registration_count()
+    cached = query._normalized
+    if cached is not None and cached[0] == registrations:
+        return cached[1]
 
+    new_root = _normalize_root(query.root)
+    if new_root is query.root:
+        # Already normalized.
+        return query
 
-@normalize.implementation(for_type=ast.Expression)
-def normalize(expr):
-    return expr
+    # Building the new query also formats its source, so only do it once.
+    normalized = q.Query(query, root=new_root)
+    query._normalized = (registrations, normalized)
+    return normalized
 
 
-@normalize.implementation(for_type=ast.BinaryExpression)
+@normalize.implementation(for_type=ast.Expression)
 def normalize(expr):
-    """Normalize both sides, but don't eliminate the expression."""
-    lhs = normalize(expr.lhs)
-    rhs = normalize(expr.rhs)
-    return type(expr)(lhs, rhs, start=lhs.start, end=rhs.end)
+    return expr
 
 
 @normalize.implementation(for_type=ast.Apply)
 def normalize(expr):
     """No elimination, but normalize arguments."""
     args = [normalize(arg) for arg in expr.args]
+    if all(arg is old_arg for arg, old_arg in zip(args, expr.args)):
+        return expr
 
     return type(expr)(expr.func, *args, start=expr.start, end=expr.end)
 
 
-@normalize.implementation(for_type=ast.VariadicExpression)
-def normalize(expr):
-    """Pass through n-ary expressions, and eliminate empty branches.
+def _rebuild_binary(expr, branches):
+    """Rebuild 'expr' from its normalized sides, but don't eliminate it."""
+    lhs, rhs = branches
+    if lhs is expr.lhs and rhs is expr.rhs:
+        # Nothing changed below us - no need for a new node.
+        return expr
+
+    return type(expr).from_children((lhs, rhs), start=lhs.start, end=rhs.end)
 
-    Variadic and binary expressions recursively visit all their children.
 
-    If all children are eliminated then the parent expression is also
-    eliminated:
+def _rebuild_variadic(expr, branches):
+    """Pass through n-ary expressions, and eliminate empty branches.
+
+    'branches' are the normalized operands of 'expr' (see _operands). If all
+    children are eliminated then the parent expression is also eliminated:
 
     (& [removed] [removed]) => [removed]
 
@@ -91,13 +107,13 @@ def normalize(expr):
 
     (& True) => True
     """
+    expr_type = type(expr)
     children = []
-    for child in expr.children:
-        branch = normalize(child)
+    for branch in branches:
         if branch is None:
             continue
 
-        if type(branch) is type(expr):
+        if type(branch) is expr_type:
             children.extend(branch.children)
         else:
             children.append(branch)
@@ -108,5 +124,132 @@ def normalize(expr):
     if len(children) == 1:
         return children[0]
 
-    return type(expr)(*children, start=children[0].start,
-                      end=children[-1].end)
+    if (len(children) == len(expr.children)
+            and all(child is old_child
+                    for child, old_child in zip(children, expr.children))):
+        return expr
+
+    # The children came out of an instance of expr_type, so there's no need to
+    # check them again.
+    return expr_type.from_children(children, start=children[0].start,
+                                   end=children[-1].end)
+
+
+def _operands(expr):
+    """Return children of 'expr', with nested expressions of its type inlined.
+
+    Intersection(x, Intersection(y, z)) has the operands x, y and z. Inlining
+    the nested expressions before they're normalized means each operand is
+    only copied once, instead of once per level of nesting.
+    """
+    operands = []
+    expr_type = type(expr)
+    pending = list(reversed(expr.children))
+    while pending:
+        child = pending.pop()
+        if type(child) is expr_type:
+            pending.extend(reversed(child.children))
+        else:
+            operands.append(child)
+
+    return operands
+
+
+# Holds 'memo' while a query or expression is being normalized: a dict of
+# id(expr) -> (expr, normalized). Keeping expr in the value keeps it alive, so
+# its id can't be reused while the memo is in use. Thread-local, so concurrent
+# calls each get their own.
+_LOCAL = threading.local()
+
+
+def _normalize_root(expr):
+    """Normalize 'expr', normalizing shared subexpressions only once."""
+    if getattr(_LOCAL, "memo", None) is not None:
+        # Already inside a call - keep using the outer memo.
+        return normalize(expr)
+
+    _LOCAL.memo = {}
+    try:
+        return normalize(expr)
+    finally:
+        _LOCAL.memo = None
+
+
+# Leaves, which normalize to themselves. _normalize_tree passes these through
+# without dispatching, so this must agree with the implementations above.
+_LEAF_TYPES = frozenset([ast.Literal, ast.Var])
+
+
+def _normalize_tree(expr):
+    """Normalize binary and variadic expressions without recursion.
+
+    Long chains of AND/OR (and other operators) make for very deep trees. This
+    walks them in post-order using an explicit stack, so that normalizing them
+    doesn't cost a Python frame per node or run into the recursion limit.
+    Children with other implementations of normalize are passed to them.
+    """
+    memo = getattr(_LOCAL, "memo", None)
+
+    # Stack of (expr, rebuild, count), where rebuild is None if the children
+    # of expr still need to be pushed. Otherwise, the last 'count' results are
+    # the normalized children to rebuild it from.
+    stack = [(expr, None, 0)]
+    results = []
+
+    while stack:
+        expr, rebuild, count = stack.pop()
+        if rebuild is not None:
+            offset = len(results) - count
+            branches = results[offset:]
+            del results[offset:]
+            result = rebuild(expr, branches)
+            if memo is not None:
+                memo[id(expr)] = (expr, result)
+
+            results.append(result)
+            continue
+
+        expr_type = type(expr)
+        if expr_type in _LEAF_TYPES:
+            results.append(expr)
+            continue
+
+        if memo is not None:
+            entry = memo.get(id(expr))
+            if entry is not None:
+                results.append(entry[1])
+                continue
+
+        handler = normalize.implementation_for_type(expr_type)
+        if handler is not _normalize_structure:
+            result = handler(expr) if handler else normalize(expr)
+            if memo is not None:
+                memo[id(expr)] = (expr, result)
+
+            results.append(result)
+            continue
+
+        if isinstance(expr, ast.VariadicExpression):
+            rebuild = _rebuild_variadic
+            children = _operands(expr)
+        else:
+            rebuild = _rebuild_binary
+            children = expr.children
+
+        stack.append((expr, rebuild, len(children)))
+        stack.extend((child, None, 0) for child in reversed(children))
+
+    return results[0]
+
+
+def _normalize_structure(expr):
+    """Normalize implementation for binary and variadic expressions."""
+    if getattr(_LOCAL, "memo", None) is None:
+        return _normalize_root(expr)
+
+    return _normalize_tree(expr)
+
+
+normalize.implement(
+    for_types=(ast.BinaryExpression, ast.VariadicExpression),
+    implementation=_normalize_structure)
@@ -23,6 +23,8 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 # pylint: disable=function-redefined
 
 import collections
+import functools
+import operator
 import re
 import six
 
@@ -49,6 +51,16 @@ from efilter.stdlib import core as std_core
 
 Result = collections.namedtuple("Result", ["value", "branch"])
 
+# Results are immutable, so the constant ones are allocated once and shared.
+# Relations and logical operators return these on every row.
+_TRUE_RESULT = Result(True, ())
+_FALSE_RESULT = Result(False, ())
+
+# Same as Result(value, branch), but called as _make_result((value, branch)).
+# It skips the Python-level __new__ namedtuple generates, which is worth it for
+# the results built on every row, such as those of vars and literals.
+_make_result = functools.partial(tuple.__new__, Result)
+
 
 @dispatch.multimethod
 def solve(query, vars):
@@ -81,6 +93,22 @@ def solve(query, vars):
     raise NotImplementedError()
 
 
+def _solve(expr, vars):
+    """Same as solve(expr, vars), but calls the implementation directly.
+
+    Implementations below use this to solve their subexpressions, which skips
+    the multimethod's dispatch overhead for every node and every row. The
+    lookup goes through the multimethod's own cache, so implementations
+    registered later are picked up.
+    """
+    handler = solve.implementation_for_type(type(expr))
+    if handler is None:
+        # Let the multimethod raise the usual error.
+        return solve(expr, vars)
+
+    return handler(expr, vars)
+
+
 def __solve_for_repeated(expr, vars):
     """Helper: solve 'expr' always returning an IRepeated.
 
@@ -100,10 +128,10 @@ def __solve_for_repeated(expr, vars):
         IRepeated result of solving 'expr'.
         A booelan to indicate whether the original was repeating.
     """
-    var = solve(expr, vars).value
+    var = _solve(expr, vars).value
     if (var and isinstance(var, (tuple, list))
             and protocol.implements(var[0], structured.IStructured)):
-        return repeated.meld(*var), False
+        return repeated.meld_iter(var), False
 
     return var, repeated.isrepeating(var)
 
@@ -124,7 +152,14 @@ def __solve_for_scalar(expr, vars):
     Raises:
         EfilterTypeError if it cannot get a scalar.
     """
-    var = solve(expr, vars).value
+    return __as_scalar(expr, _solve(expr, vars).value)
+
+
+def __as_scalar(expr, var):
+    """Helper: the scalar in 'var', the value of 'expr'.
+
+    See __solve_for_scalar.
+    """
     try:
         scalar = repeated.getvalue(var)
     except TypeError:
@@ -215,8 +250,19 @@ def solve_query(query, vars):
     # caller can add them to vars using ScopeStack.
     vars = scope.ScopeStack(std_core.MODULE, vars)
 
+    # Queries are often solved once per row, so compiling pays off quickly.
+    # The compiled function calls the solve implementations that existed when
+    # it was built, so it's rebuilt if any were registered since.
+    registrations = dispatch.registration_count()
+    cached = query._compiled
+    if cached is not None and cached[0] == registrations:
+        compiled = cached[1]
+    else:
+        compiled = _compile(query.root)
+        query._compiled = (registrations, compiled)
+
     try:
-        return solve(query.root, vars)
+        return compiled(vars)
     except errors.EfilterError as error:
         if not error.query:
             error.query = query.source
@@ -227,33 +273,49 @@ def solve_query(query, vars):
 def solve_literal(expr, vars):
     """Returns just the value of literal."""
     _ = vars
-    return Result(expr.value, ())
+    return _make_result((expr.value, ()))
 
 
 @solve.implementation(for_type=ast.Var)
 def solve_var(expr, vars):
     """Returns the value of the var named in the expression."""
     try:
-        return Result(structured.resolve(vars, expr.value), ())
-    except (KeyError, AttributeError) as e:
+        value = structured.resolve(vars, expr.value)
+    except _RESOLVE_ERRORS as e:
+        raise _resolve_error(expr, vars, e)
+
+    return _make_result((value, ()))
+
+
+# Exceptions that resolving a var can raise. _resolve_error turns them into
+# the right EfilterError.
+_RESOLVE_ERRORS = (KeyError, AttributeError, TypeError, ValueError,
+                   NotImplementedError)
+
+
+def _resolve_error(expr, vars, error):
+    """Return the EfilterError for 'error', raised resolving 'expr' in 'vars'.
+    """
+    if isinstance(error, (KeyError, AttributeError)):
         # Raise a better exception for accessing a non-existent member.
-        raise errors.EfilterKeyError(root=expr, key=expr.value, message=e,
-                                     query=expr.source)
-    except (TypeError, ValueError) as e:
+        return errors.EfilterKeyError(root=expr, key=expr.value, message=error,
+                                      query=expr.source)
+
+    if isinstance(error, (TypeError, ValueError)):
         # Raise a better exception for what is probably a null pointer error.
         if vars.locals is None:
-            raise errors.EfilterNoneError(
+            return errors.EfilterNoneError(
                 root=expr, query=expr.source,
                 message="Trying to access member %r of a null." % expr.value)
-        else:
-            raise errors.EfilterTypeError(
-                root=expr, query=expr.source,
-                message="%r (vars: %r)" % (e, vars))
-    except NotImplementedError as e:
-        raise errors.EfilterError(
+
+        return errors.EfilterTypeError(
             root=expr, query=expr.source,
-            message="Trying to access member %r of an instance of %r." %
-            (expr.value, type(vars)))
+            message="%r (vars: %r)" % (error, vars))
+
+    return errors.EfilterError(
+        root=expr, query=expr.source,
+        message="Trying to access member %r of an instance of %r." %
+        (expr.value, type(vars)))
 
 
 @solve.implementation(for_type=ast.Select)
@@ -265,7 +327,7 @@ def solve_select(expr, vars):
     new repeated value.
     """
     data, _ = __solve_for_repeated(expr.lhs, vars)
-    key = solve(expr.rhs, vars).value
+    key = _solve(expr.rhs, vars).value
 
     try:
         results = [associative.select(d, key) for d in repeated.getvalues(data)]
@@ -285,7 +347,7 @@ def solve_select(expr, vars):
             root=expr, query=expr.source,
             message="Cannot select keys from a non-associative value.")
 
-    return Result(repeated.meld(*results), ())
+    return Result(repeated.meld_iter(results), ())
 
 
 @solve.implementation(for_type=ast.Resolve)
@@ -297,7 +359,7 @@ def solve_resolve(expr, vars):
     new repeated values.
     """
     objs, _ = __solve_for_repeated(expr.lhs, vars)
-    member = solve(expr.rhs, vars).value
+    member = _solve(expr.rhs, vars).value
 
     try:
         results = [structured.resolve(o, member)
@@ -319,7 +381,7 @@ def solve_resolve(expr, vars):
             root=expr, query=expr.source,
             message="Cannot resolve members from a non-structured value.")
 
-    return Result(repeated.meld(*results), ())
+    return Result(repeated.meld_iter(results), ())
 
 
 @solve.implementation(for_type=ast.Apply)
@@ -341,9 +403,9 @@ def solve_apply(expr, vars):
                     root=arg.lhs,
                     message="Invalid argument name.")
 
-            kwargs[arg.key.value] = solve(arg.value, vars).value
+            kwargs[arg.key.value] = _solve(arg.value, vars).value
         else:
-            args.append(solve(arg, vars).value)
+            args.append(_solve(arg, vars).value)
 
     result = applicative.apply(func, args, kwargs)
 
@@ -373,14 +435,14 @@ def solve_bind(expr, vars):
     value_expressions = []
     keys = []
     for pair in expr.children:
-        keys.append(solve(pair.key, vars).value)
+        keys.append(_solve(pair.key, vars).value)
         value_expressions.append(pair.value)
 
     result = row_tuple.RowTuple(ordered_columns=keys)
     intermediate_scope = scope.ScopeStack(vars, result)
 
     for idx, value_expression in enumerate(value_expressions):
-        value = solve(value_expression, intermediate_scope).value
+        value = _solve(value_expression, intermediate_scope).value
         # Update the intermediate bindings so as to make earlier bindings
         # already available to the next child-expression.
         result[keys[idx]] = value
@@ -392,7 +454,8 @@ def solve_bind(expr, vars):
 def solve_repeat(expr, vars):
     """Build a repeated value from subexpressions."""
     try:
-        result = repeated.meld(*[solve(x, vars).value for x in expr.children])
+        result = repeated.meld_iter(_solve(x, vars).value
+                                     for x in expr.children)
         return Result(result, ())
     except TypeError:
         raise errors.EfilterTypeError(
@@ -403,7 +466,7 @@ def solve_repeat(expr, vars):
 @solve.implementation(for_type=ast.Tuple)
 def solve_tuple(expr, vars):
     """Build a tuple from subexpressions."""
-    result = tuple(solve(x, vars).value for x in expr.children)
+    result = tuple(_solve(x, vars).value for x in expr.children)
     return Result(result, ())
 
 
@@ -411,10 +474,10 @@ def solve_tuple(expr, vars):
 def solve_ifelse(expr, vars):
     """Evaluate conditions and return the one that matches."""
     for condition, result in expr.conditions():
-        if boolean.asbool(solve(condition, vars).value):
-            return solve(result, vars)
+        if boolean.asbool(_solve(condition, vars).value):
+            return _solve(result, vars)
 
-    return solve(expr.default(), vars)
+    return _solve(expr.default(), vars)
 
 
 @solve.implementation(for_type=ast.Map)
@@ -435,10 +498,10 @@ def solve_map(expr, vars):
     lhs_values, _ = __solve_for_repeated(expr.lhs, vars)
 
     def lazy_map():
+        solve_rhs = _compile(expr.rhs)
         try:
             for lhs_value in repeated.getvalues(lhs_values):
-                yield solve(expr.rhs,
-                            __nest_scope(expr.lhs, vars, lhs_value)).value
+                yield solve_rhs(__nest_scope(expr.lhs, vars, lhs_value)).value
         except errors.EfilterNoneError as error:
             error.root = expr
             raise
@@ -449,14 +512,14 @@ def solve_map(expr, vars):
 @solve.implementation(for_type=ast.Let)
 def solve_let(expr, vars):
     """Solves a let-form by calling RHS with nested scope."""
-    lhs_value = solve(expr.lhs, vars).value
+    lhs_value = _solve(expr.lhs, vars).value
     if not isinstance(lhs_value, structured.IStructured):
         raise errors.EfilterTypeError(
             root=expr.lhs, query=expr.original,
             message="The LHS of 'let' must evaluate to an IStructured. Got %r."
             % (lhs_value,))
 
-    return solve(expr.rhs, __nest_scope(expr.lhs, vars, lhs_value))
+    return _solve(expr.rhs, __nest_scope(expr.lhs, vars, lhs_value))
 
 
 @solve.implementation(for_type=ast.Filter)
@@ -468,21 +531,27 @@ def solve_filter(expr, vars):
     lhs_values, _ = __solve_for_repeated(expr.lhs, vars)
 
     def lazy_filter():
-        for lhs_value in repeated.getvalues(lhs_values):
-            if solve(expr.rhs, __nest_scope(expr.lhs, vars, lhs_value)).value:
-                yield lhs_value
+        return __filter_values(expr, vars, lhs_values)
 
     return Result(repeated.lazy(lazy_filter), ())
 
 
+def __filter_values(expr, vars, lhs_values):
+    """Helper: yield the values in 'lhs_values' that pass the Filter 'expr'."""
+    solve_rhs = _compile(expr.rhs)
+    for lhs_value in repeated.getvalues(lhs_values):
+        if solve_rhs(__nest_scope(expr.lhs, vars, lhs_value)).value:
+            yield lhs_value
+
+
 @solve.implementation(for_type=ast.Reducer)
 def solve_reducer(expr, vars):
     def _mapper(rows):
-        mapper = expr.mapper
+        solve_mapper = _compile(expr.mapper)
         for row in rows:
-            yield solve(mapper, __nest_scope(expr.lhs, vars, row)).value
+            yield solve_mapper(__nest_scope(expr.lhs, vars, row)).value
 
-    delegate = solve(expr.reducer, vars).value
+    delegate = _solve(expr.reducer, vars).value
 
     return Result(reducer.Map(delegate=delegate, mapper=_mapper), ())
 
@@ -490,16 +559,17 @@ def solve_reducer(expr, vars):
 @solve.implementation(for_type=ast.Group)
 def solve_group(expr, vars):
     rows, _ = __solve_for_repeated(expr.lhs, vars)
-    reducers = [solve(child, vars).value for child in expr.reducers]
+    reducers = [_solve(child, vars).value for child in expr.reducers]
     r = reducer.Compose(*reducers)
     intermediates = {}
+    solve_grouper = _compile(expr.grouper)
 
     # To avoid loading too much data into memory we segment the input rows.
     for chunk in reducer.generate_chunks(rows, reducer.DEFAULT_CHUNK_SIZE):
         # Group rows based on the output of the grouper expression.
         groups = {}
         for value in chunk:
-            key = solve(expr.grouper, __nest_scope(expr.lhs, vars, value)).value
+            key = solve_grouper(__nest_scope(expr.lhs, vars, value)).value
             grouped_values = groups.setdefault(key, [])
             grouped_values.append(value)
 
@@ -521,22 +591,30 @@ def solve_group(expr, vars):
     results = [reducer.finalize(r, intermediate)
                for intermediate in six.itervalues(intermediates)]
 
-    return Result(repeated.meld(*results), ())
+    return Result(repeated.meld_iter(results), ())
 
 
 @solve.implementation(for_type=ast.Sort)
 def solve_sort(expr, vars):
     """Sort values on the LHS by the value they yield when passed to RHS."""
-    lhs_values = repeated.getvalues(__solve_for_repeated(expr.lhs, vars)[0])
+    lhs = expr.lhs
+    if solve.implementation_for_type(type(lhs)) is _SOLVE_FILTER:
+        # ORDER BY usually sorts the output of WHERE. Pull the values straight
+        # through the filter, instead of wrapping them in a lazy repeated
+        # value only to unwrap them again.
+        lhs_values = __filter_values(
+            lhs, vars, __solve_for_repeated(lhs.lhs, vars)[0])
+    else:
+        lhs_values = repeated.getvalues(__solve_for_repeated(lhs, vars)[0])
 
-    sort_expression = expr.rhs
+    solve_sort_expression = _compile(expr.rhs)
 
     def _key_func(x):
-        return solve(sort_expression, __nest_scope(expr.lhs, vars, x)).value
+        return solve_sort_expression(__nest_scope(expr.lhs, vars, x)).value
 
     results = ordered.ordered(lhs_values, key_func=_key_func)
 
-    return Result(repeated.meld(*results), ())
+    return Result(repeated.meld_iter(results), ())
 
 
 @solve.implementation(for_type=ast.Each)
@@ -550,14 +628,15 @@ def solve_each(expr, vars):
     will be returned only if each result is true.
     """
     lhs_values, _ = __solve_for_repeated(expr.lhs, vars)
+    solve_rhs = _compile(expr.rhs)
 
     for lhs_value in repeated.getvalues(lhs_values):
-        result = solve(expr.rhs, __nest_scope(expr.lhs, vars, lhs_value))
+        result = solve_rhs(__nest_scope(expr.lhs, vars, lhs_value))
         if not result.value:
             # Each is required to return an actual boolean.
-            return result._replace(value=False)
+            return Result(False, result.branch)
 
-    return Result(True, ())
+    return _TRUE_RESULT
 
 
 @solve.implementation(for_type=ast.Any)
@@ -572,12 +651,13 @@ def solve_any(expr, vars):
         # Just see if we have anything on the LHS.
         return Result(len(repeated.getvalues(lhs_values)) > 0, ())
 
-    result = Result(False, ())
+    result = _FALSE_RESULT
+    solve_rhs = _compile(rhs)
     for lhs_value in repeated.getvalues(lhs_values):
-        result = solve(rhs, __nest_scope(expr.lhs, vars, lhs_value))
+        result = solve_rhs(__nest_scope(expr.lhs, vars, lhs_value))
         if result.value:
             # Any is required to return an actual boolean.
-            return result._replace(value=True)
+            return Result(True, result.branch)
 
     return result
 
@@ -585,8 +665,8 @@ def solve_any(expr, vars):
 @solve.implementation(for_type=ast.Cast)
 def solve_cast(expr, vars):
     """Get cast LHS to RHS."""
-    lhs = solve(expr.lhs, vars).value
-    t = solve(expr.rhs, vars).value
+    lhs = _solve(expr.lhs, vars).value
+    t = _solve(expr.rhs, vars).value
 
     if t is None:
         raise errors.EfilterTypeError(
@@ -611,10 +691,10 @@ def solve_cast(expr, vars):
 @solve.implementation(for_type=ast.IsInstance)
 def solve_isinstance(expr, vars):
     """Typecheck whether LHS is type on the RHS."""
-    lhs = solve(expr.lhs, vars)
+    lhs = _solve(expr.lhs, vars)
 
     try:
-        t = solve(expr.rhs, vars).value
+        t = _solve(expr.rhs, vars).value
     except errors.EfilterKeyError:
         t = None
 
@@ -633,18 +713,18 @@ def solve_isinstance(expr, vars):
 
 @solve.implementation(for_type=ast.Complement)
 def solve_complement(expr, vars):
-    result = solve(expr.value, vars)
-    return result._replace(value=not result.value)
+    result = _solve(expr.value, vars)
+    return _make_result((not result.value, result.branch))
 
 
 @solve.implementation(for_type=ast.Intersection)
 def solve_intersection(expr, vars):
-    result = Result(False, ())
+    result = _FALSE_RESULT
     for child in expr.children:
-        result = solve(child, vars)
+        result = _solve(child, vars)
         if not result.value:
             # Intersections don't preserve the last value the way Unions do.
-            return result._replace(value=False)
+            return Result(False, result.branch)
 
     return result
 
@@ -652,21 +732,21 @@ def solve_intersection(expr, vars):
 @solve.implementation(for_type=ast.Union)
 def solve_union(expr, vars):
     for child in expr.children:
-        result = solve(child, vars)
+        result = _solve(child, vars)
         if result.value:
             # Don't replace a matched child branch. Also, preserve the actual
             # value of the last subexpression (as opposed to just returning a
             # boolean).
             if result.branch:
                 return result
-            return result._replace(branch=child)
+            return Result(result.value, child)
 
-    return Result(False, ())
+    return _FALSE_RESULT
 
 
 @solve.implementation(for_type=ast.Pair)
 def solve_pair(expr, vars):
-    return Result((solve(expr.lhs, vars).value, solve(expr.rhs, vars).value),
+    return Result((_solve(expr.lhs, vars).value, _solve(expr.rhs, vars).value),
                   ())
 
 
@@ -759,9 +839,9 @@ def solve_equivalence(expr, vars):
     for child in children:
         value = __solve_for_scalar(child, vars)
         if not value == first_value:
-            return Result(False, ())
+            return _FALSE_RESULT
 
-    return Result(True, ())
+    return _TRUE_RESULT
 
 
 @solve.implementation(for_type=ast.Membership)
@@ -775,7 +855,7 @@ def solve_membership(expr, vars):
     # false and "foo" in ("foo", "bar") is again true. These semantics are a
     # little unfortunate, and it may be that, in the future, the in operator
     # is disallowed on repeated values to prevent ambiguity.
-    needle = solve(expr.element, vars).value
+    needle = _solve(expr.element, vars).value
     if repeated.isrepeating(needle):
         raise errors.EfilterError(
             root=expr.element, query=expr.source,
@@ -800,9 +880,9 @@ def solve_membership(expr, vars):
     if isrepeating or isinstance(haystack, (tuple, list)):
         for straw in haystack:  # We're all farmers here.
             if straw == needle:
-                return Result(True, ())
+                return _TRUE_RESULT
 
-        return Result(False, ())
+        return _FALSE_RESULT
 
     # If haystack is not a repeating value, but it is iterable then it must
     # have originated from outside EFILTER. Lets try to do the right thing and
@@ -810,7 +890,28 @@ def solve_membership(expr, vars):
     for straw in haystack:
         return Result(needle in straw, None)
 
-    return Result(False, ())
+    return _FALSE_RESULT
+
+
+# Dict of pattern -> compiled regex. Queries usually match the same literal
+# pattern against every row, and a dict lookup is cheaper than going through
+# re.compile's own cache. Cleared when full, like the re module does.
+_REGEX_CACHE = {}
+_REGEX_CACHE_SIZE = 256
+
+
+def _compile_regex(pattern):
+    try:
+        return _REGEX_CACHE[pattern]
+    except KeyError:
+        pass
+
+    compiled = re.compile(pattern)
+    if len(_REGEX_CACHE) >= _REGEX_CACHE_SIZE:
+        _REGEX_CACHE.clear()
+
+    _REGEX_CACHE[pattern] = compiled
+    return compiled
 
 
 @solve.implementation(for_type=ast.RegexFilter)
@@ -818,7 +919,7 @@ def solve_regexfilter(expr, vars):
     string = __solve_for_scalar(expr.string, vars)
     pattern = __solve_for_scalar(expr.regex, vars)
 
-    return Result(re.compile(pattern).search(six.text_type(string)), ())
+    return Result(_compile_regex(pattern).search(six.text_type(string)), ())
 
 
 @solve.implementation(for_type=ast.StrictOrderedSet)
@@ -827,14 +928,14 @@ def solve_strictorderedset(expr, vars):
     min_ = __solve_for_scalar(next(iterator), vars)
 
     if min_ is None:
-        return Result(False, ())
+        return _FALSE_RESULT
 
     for child in iterator:
         val = __solve_for_scalar(child, vars)
 
         try:
             if not min_ > val or val is None:
-                return Result(False, ())
+                return _FALSE_RESULT
         except TypeError:
             raise errors.EfilterTypeError(expected=type(min_),
                                           actual=type(val),
@@ -843,7 +944,7 @@ def solve_strictorderedset(expr, vars):
 
         min_ = val
 
-    return Result(True, ())
+    return _TRUE_RESULT
 
 
 @solve.implementation(for_type=ast.PartialOrderedSet)
@@ -852,14 +953,14 @@ def solve_partialorderedset(expr, vars):
     min_ = __solve_for_scalar(next(iterator), vars)
 
     if min_ is None:
-        return Result(False, ())
+        return _FALSE_RESULT
 
     for child in iterator:
         val = __solve_for_scalar(child, vars)
 
         try:
             if min_ < val or val is None:
-                return Result(False, ())
+                return _FALSE_RESULT
         except TypeError:
             raise errors.EfilterTypeError(expected=type(min_),
                                           actual=type(val),
@@ -868,4 +969,434 @@ def solve_partialorderedset(expr, vars):
 
         min_ = val
 
-    return Result(True, ())
+    return _TRUE_RESULT
+
+
+# Compiling expressions to closures.
+#
+# The closures do the same as calling solve on the expression, but the nodes
+# that make up the (usually boolean) structure of the query are resolved once
+# up front, instead of being dispatched on for every row. Besides query roots,
+# this is used for subexpressions solved once per value of a repeated var, such
+# as the condition of a WHERE clause.
+
+
+def _compile(expr):
+    """Return a function of 'vars' equivalent to solve(expr, vars)."""
+    handler = solve.implementation_for_type(type(expr))
+    if handler is None:
+        # Let the multimethod raise the usual error.
+        return functools.partial(solve, expr)
+
+    if handler in _FOLDABLE and _is_constant(expr):
+        try:
+            result = handler(expr, scope.ScopeStack(std_core.MODULE, {}))
+        except Exception:  # pylint: disable=broad-except
+            # Leave it to solving at runtime to raise the error, in context.
+            pass
+        else:
+            def solve_folded(_):
+                return result
+
+            return solve_folded
+
+    # Keyed on the implementation, so that types with their own (overriding)
+    # implementations don't get compiled into the built-in behavior.
+    compiler = _COMPILERS.get(handler)
+    if compiler is None:
+        return functools.partial(handler, expr)
+
+    return compiler(expr)
+
+
+def _is_constant(expr):
+    """Whether 'expr' solves to the same value regardless of vars."""
+    if type(expr) is ast.Literal:
+        return True
+
+    if solve.implementation_for_type(type(expr)) not in _FOLDABLE:
+        return False
+
+    return all(_is_constant(child) for child in expr.children)
+
+
+def _compile_literal(expr):
+    result = Result(expr.value, ())
+
+    def solve_compiled(_):
+        return result
+
+    return solve_compiled
+
+
+def _compile_resolve(expr):
+    """Return a function of 'vars' returning solve(expr, vars).value for a Var.
+    """
+    name = expr.value
+
+    def resolve_var(vars):
+        # Solvers always pass a ScopeStack, so skip the dispatch on IStructured.
+        if type(vars) is scope.ScopeStack:
+            try:
+                return vars.resolve(name)
+            except _RESOLVE_ERRORS as e:
+                # Same error as solve_var, without resolving the name again.
+                raise _resolve_error(expr, vars, e)
+
+        return _SOLVE_VAR(expr, vars).value
+
+    return resolve_var
+
+
+def _compile_var(expr):
+    resolve_var = _compile_resolve(expr)
+
+    def solve_compiled(vars):
+        return _make_result((resolve_var(vars), ()))
+
+    return solve_compiled
+
+
+def _compile_complement(expr):
+    solve_value = _compile(expr.value)
+
+    def solve_compiled(vars):
+        result = solve_value(vars)
+        return _make_result((not result.value, result.branch))
+
+    return solve_compiled
+
+
+def _compile_intersection(expr):
+    solve_children = [_compile(child) for child in expr.children]
+
+    # See solve_intersection.
+    def solve_compiled(vars):
+        result = _FALSE_RESULT
+        for solve_child in solve_children:
+            result = solve_child(vars)
+            if not result.value:
+                return Result(False, result.branch)
+
+        return result
+
+    return solve_compiled
+
+
+def _compile_union(expr):
+    solve_children = [(_compile(child), child) for child in expr.children]
+
+    # See solve_union.
+    def solve_compiled(vars):
+        for solve_child, child in solve_children:
+            result = solve_child(vars)
+            if result.value:
+                if result.branch:
+                    return result
+                return Result(result.value, child)
+
+        return _FALSE_RESULT
+
+    return solve_compiled
+
+
+# Values of these types are their own scalar (see __as_scalar), so compiled
+# code can skip the protocol checks for them.
+_PLAIN_SCALAR_TYPES = frozenset(
+    six.integer_types + (bool, float, six.text_type, six.binary_type,
+                         type(None)))
+
+
+def _compile_scalar(expr):
+    """Return a function of 'vars' equivalent to __solve_for_scalar(expr, vars).
+    """
+    handler = solve.implementation_for_type(type(expr))
+    if handler is _SOLVE_LITERAL and type(expr.value) in _PLAIN_SCALAR_TYPES:
+        value = expr.value
+
+        def scalar_constant(_):
+            return value
+
+        return scalar_constant
+
+    if handler is _SOLVE_VAR:
+        resolve_var = _compile_resolve(expr)
+
+        def scalar_var(vars):
+            value = resolve_var(vars)
+            if type(value) in _PLAIN_SCALAR_TYPES:
+                return value
+
+            return __as_scalar(expr, value)
+
+        return scalar_var
+
+    solve_compiled = _compile(expr)
+
+    def scalar_compiled(vars):
+        value = solve_compiled(vars).value
+        if type(value) in _PLAIN_SCALAR_TYPES:
+            return value
+
+        return __as_scalar(expr, value)
+
+    return scalar_compiled
+
+
+def _compile_equivalence(expr):
+    scalars = [_compile_scalar(child) for child in expr.children]
+    first_scalar = scalars[0]
+    other_scalars = scalars[1:]
+
+    # See solve_equivalence.
+    def solve_compiled(vars):
+        first_value = first_scalar(vars)
+        for scalar in other_scalars:
+            if not scalar(vars) == first_value:
+                return _FALSE_RESULT
+
+        return _TRUE_RESULT
+
+    return solve_compiled
+
+
+def _compile_accumulation(expr, start, accumulate):
+    """Compile Sum and Product.
+
+    Arguments:
+        expr: The expression to compile.
+        start: The value to start accumulating from.
+        accumulate: The augmented assignment to accumulate with, such as
+            operator.iadd.
+    """
+    scalars = [(_compile_scalar(child), child) for child in expr.children]
+
+    # See solve_sum.
+    def solve_compiled(vars):
+        total = start
+        for scalar, child in scalars:
+            val = scalar(vars)
+            try:
+                total = accumulate(total, val)
+            except TypeError:
+                raise errors.EfilterTypeError(expected=number.INumber,
+                                              actual=type(val),
+                                              root=child, query=expr.source)
+
+        return _make_result((total, ()))
+
+    return solve_compiled
+
+
+def _compile_sum(expr):
+    return _compile_accumulation(expr, 0, operator.iadd)
+
+
+def _compile_product(expr):
+    return _compile_accumulation(expr, 1, operator.imul)
+
+
+def _compile_reduction(expr, reduce_):
+    """Compile Difference and Quotient.
+
+    Arguments:
+        expr: The expression to compile.
+        reduce_: The augmented assignment to fold the children with, such as
+            operator.isub.
+    """
+    first_scalar = _compile_scalar(expr.children[0])
+    other_scalars = [(idx, _compile_scalar(child))
+                     for idx, child in enumerate(expr.children)][1:]
+
+    # See solve_difference.
+    def solve_compiled(vars):
+        result = first_scalar(vars)
+        for idx, scalar in other_scalars:
+            val = scalar(vars)
+            try:
+                result = reduce_(result, val)
+            except TypeError:
+                if idx == 1:
+                    actual_t = type(result)
+                else:
+                    actual_t = type(val)
+
+                raise errors.EfilterTypeError(expected=number.INumber,
+                                              actual=actual_t,
+                                              root=expr.children[idx - 1],
+                                              query=expr.source)
+
+        return _make_result((result, ()))
+
+    return solve_compiled
+
+
+def _compile_difference(expr):
+    return _compile_reduction(expr, operator.isub)
+
+
+def _divide(x, y):
+    # Same as solve_quotient, whatever division means on this Python version.
+    x /= y
+    return x
+
+
+def _compile_quotient(expr):
+    return _compile_reduction(expr, _divide)
+
+
+# Values of these types compare equal only when their hashes are equal too,
+# so looking them up in a frozenset gives the same answer as comparing them
+# one by one. (Floats are left out because of NaN.)
+_HASHED_SCALAR_TYPES = frozenset(
+    six.integer_types + (bool, six.text_type, six.binary_type))
+
+
+def _literal_haystack(expr):
+    """Return the values of 'expr' as a tuple if it's a literal collection.
+
+    Returns None unless 'expr' is a Tuple, or a Repeat of more than one value,
+    whose children are all literals of _HASHED_SCALAR_TYPES. For those,
+    solve_membership checks the needle against each value for equality.
+    """
+    handler = solve.implementation_for_type(type(expr))
+    if handler is _SOLVE_TUPLE:
+        min_count = 1
+    elif handler is _SOLVE_REPEAT:
+        min_count = 2
+    else:
+        return None
+
+    values = []
+    for child in expr.children:
+        if (solve.implementation_for_type(type(child)) is not _SOLVE_LITERAL
+                or type(child.value) not in _HASHED_SCALAR_TYPES):
+            return None
+
+        values.append(child.value)
+
+    if len(values) < min_count:
+        return None
+
+    if (handler is _SOLVE_REPEAT
+            and len(set(type(value) for value in values)) != 1):
+        # Mixed types raise an error when the Repeat is solved.
+        return None
+
+    return tuple(values)
+
+
+def _compile_membership(expr):
+    handler = solve.implementation_for_type(type(expr))
+    values = _literal_haystack(expr.set)
+    if values is None:
+        return functools.partial(handler, expr)
+
+    haystack = frozenset(values)
+    solve_element = _compile(expr.element)
+
+    # See solve_membership.
+    def solve_compiled(vars):
+        needle = solve_element(vars).value
+        if type(needle) in _HASHED_SCALAR_TYPES:
+            if needle in haystack:
+                return _TRUE_RESULT
+
+            return _FALSE_RESULT
+
+        if repeated.isrepeating(needle):
+            # Let solve_membership raise the usual error.
+            return handler(expr, vars)
+
+        for straw in values:
+            if straw == needle:
+                return _TRUE_RESULT
+
+        return _FALSE_RESULT
+
+    return solve_compiled
+
+
+def _compile_orderedset(expr, in_order):
+    """Compile StrictOrderedSet and PartialOrderedSet.
+
+    Arguments:
+        expr: The expression to compile.
+        in_order: Function of (previous, next) value, returning whether they
+            are in the order 'expr' requires.
+    """
+    first_scalar = _compile_scalar(expr.children[0])
+    other_scalars = [(_compile_scalar(child), child)
+                     for child in expr.children[1:]]
+
+    # See solve_strictorderedset.
+    def solve_compiled(vars):
+        min_ = first_scalar(vars)
+        if min_ is None:
+            return _FALSE_RESULT
+
+        for scalar, child in other_scalars:
+            val = scalar(vars)
+
+            try:
+                if not in_order(min_, val) or val is None:
+                    return _FALSE_RESULT
+            except TypeError:
+                raise errors.EfilterTypeError(expected=type(min_),
+                                              actual=type(val),
+                                              root=child,
+                                              query=expr.source)
+
+            min_ = val
+
+        return _TRUE_RESULT
+
+    return solve_compiled
+
+
+def _compile_strictorderedset(expr):
+    return _compile_orderedset(expr, operator.gt)
+
+
+def _compile_partialorderedset(expr):
+    # solve_partialorderedset fails if 'min_ < val', so call the negation.
+    return _compile_orderedset(expr, lambda min_, val: not min_ < val)
+
+
+# Dict of solve implementation -> function compiling expressions it would
+# solve. Implementations not listed here are called as they are. (The
+# decorators above bind the names of the implementations to the multimethod,
+# so they're looked up by type.)
+_COMPILERS = dict(
+    (solve.implementation_for_type(expr_type), compiler)
+    for expr_type, compiler in ((ast.Literal, _compile_literal),
+                                (ast.Var, _compile_var),
+                                (ast.Complement, _compile_complement),
+                                (ast.Intersection, _compile_intersection),
+                                (ast.Union, _compile_union),
+                                (ast.Sum, _compile_sum),
+                                (ast.Product, _compile_product),
+                                (ast.Difference, _compile_difference),
+                                (ast.Quotient, _compile_quotient),
+                                (ast.Equivalence, _compile_equivalence),
+                                (ast.Membership, _compile_membership),
+                                (ast.StrictOrderedSet,
+                                 _compile_strictorderedset),
+                                (ast.PartialOrderedSet,
+                                 _compile_partialorderedset)))
+
+# Implementations that are pure functions of the values of their children.
+# _compile solves expressions of these types, whose children are all constant,
+# only once.
+_FOLDABLE = frozenset(
+    solve.implementation_for_type(expr_type)
+    for expr_type in (ast.Complement, ast.Intersection, ast.Union, ast.Sum,
+                      ast.Difference, ast.Product, ast.Quotient,
+                      ast.Equivalence, ast.Membership, ast.RegexFilter,
+                      ast.StrictOrderedSet, ast.PartialOrderedSet))
+
+_SOLVE_LITERAL = solve.implementation_for_type(ast.Literal)
+_SOLVE_VAR = solve.implementation_for_type(ast.Var)
+_SOLVE_FILTER = solve.implementation_for_type(ast.Filter)
+_SOLVE_TUPLE = solve.implementation_for_type(ast.Tuple)
+_SOLVE_REPEAT = solve.implementation_for_type(ast.Repeat)
@@ -82,18 +82,20 @@ def validate(expr, scope):
 
 @validate.implementation(for_type=ast.BinaryExpression)
 def validate(expr, scope):
+    signature = expr.type_signature
+
     lhs_type = infer_type.infer_type(expr.lhs, scope)
     if not (lhs_type is protocol.AnyType
-            or protocol.isa(lhs_type, expr.type_signature[0])):
+            or protocol.isa(lhs_type, signature[0])):
         raise errors.EfilterTypeError(root=expr.lhs,
-                                      expected=expr.type_signature[0],
+                                      expected=signature[0],
                                       actual=lhs_type)
 
     rhs_type = infer_type.infer_type(expr.rhs, scope)
     if not (lhs_type is protocol.AnyType
-            or protocol.isa(rhs_type, expr.type_signature[1])):
+            or protocol.isa(rhs_type, signature[1])):
         raise errors.EfilterTypeError(root=expr.rhs,
-                                      expected=expr.type_signature[1],
+                                      expected=signature[1],
                                       actual=rhs_type)
 
     return True
@@ -101,14 +103,14 @@ def validate(expr, scope):
 
 @validate.implementation(for_type=ast.VariadicExpression)
 def validate(expr, scope):
+    signature = expr.type_signature
     for subexpr in expr.children:
         validate(subexpr, scope)
 
         t = infer_type.infer_type(subexpr, scope)
-        if not (t is protocol.AnyType
-                or protocol.isa(t, expr.type_signature)):
+        if not (t is protocol.AnyType or protocol.isa(t, signature)):
             raise errors.EfilterTypeError(root=subexpr,
-                                          expected=expr.type_signature,
+                                          expected=signature,
                                           actual=t)
 
     return True
@@ -0,0 +1,47 @@
+# EFILTER Forensic Query Language
+#
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+EFILTER test suite.
+"""
+
+__author__ = "Adam Sindelar <adamsh@google.com>"
+
+import pickle
+import unittest
+
+from efilter import ast
+
+
+class AstTest(unittest.TestCase):
+    def testPickle(self):
+        expr = ast.Intersection(
+            ast.Equivalence(ast.Var("x"), ast.Literal("foo")),
+            ast.Membership(ast.Literal(5), ast.Repeat(ast.Literal(5))),
+            start=0, end=34, source="x == 'foo' and 5 in (5)")
+        hash(expr)  # Populate the cached hash.
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(expr, protocol))
+            self.assertEqual(copy, expr)
+            self.assertEqual(hash(copy), hash(expr))
+            self.assertEqual((copy.start, copy.end, copy.source),
+                             (expr.start, expr.end, expr.source))
+
+    def testNoDict(self):
+        expr = ast.Literal(5)
+        with self.assertRaises(AttributeError):
+            expr.foo = "bar"
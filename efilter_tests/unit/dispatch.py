@@ -134,3 +134,45 @@ class TypesTest(unittest.TestCase):
         self.assertEqual(speak(Catfish()), "Meow!")
 
         self.assertEqual(speak(SeaCow()), "Splash splash.")
+
+    def testImplementationForType(self):
+        self.assertEqual(speak.implementation_for_type(Pig)(Pig()), "Oink!")
+        self.assertIsNone(speak.implementation_for_type(Animal))
+
+    def testCacheInvalidation(self):
+        @dispatch.multimethod
+        def habitat(animal):
+            _ = animal
+            return "Unknown"
+
+        @habitat.implementation(for_type=Animal)
+        def habitat(animal):
+            _ = animal
+            return "Land"
+
+        self.assertEqual(habitat(Fish()), "Land")
+
+        # A more specific implementation registered after the first call
+        # should replace the cached one.
+        @habitat.implementation(for_type=Fish)
+        def habitat(animal):
+            _ = animal
+            return "Water"
+
+        self.assertEqual(habitat(Fish()), "Water")
+
+    def testRegistrationCount(self):
+        @dispatch.multimethod
+        def diet(animal):
+            raise NotImplementedError()
+
+        before = dispatch.registration_count()
+        diet.implement(for_type=Cow, implementation=lambda animal: "Grass")
+        after = dispatch.registration_count()
+        self.assertNotEqual(before, after)
+
+        self.assertEqual(diet(Cow()), "Grass")
+        self.assertEqual(dispatch.registration_count(), after)
+
+        diet.prefer_type(Feline, over=Aquatic)
+        self.assertNotEqual(dispatch.registration_count(), after)
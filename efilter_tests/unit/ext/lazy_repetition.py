@@ -89,3 +89,8 @@ class LazyRepetitionTest(testlib.EfilterTestCase):
 
         self.assertEqual(lazy_repetition.LazyRepetition(_generator),
                          repeated.meld(1, 2, 3))
+
+    def testEmpty(self):
+        l = lazy_repetition.LazyRepetition(lambda: iter(()))
+        self.assertEqual(list(l.getvalues()), [])
+        self.assertEqual(l.count(), 0)
@@ -36,6 +36,14 @@ class LazyFileReadersTest(testlib.EfilterTestCase):
             reader = line_reader.LazyLineReader(fd)
             self.assertEqual(len(list(reader)), line_count)
 
+    def testReadingInBatches(self):
+        """Test that reading a few lines at a time doesn't lose any."""
+        with open(testlib.get_fixture_path("names.txt"), "r") as fd:
+            reader = line_reader.LazyLineReader(fd)
+            expected = list(reader)
+            reader.read_size_hint = 0
+            self.assertEqual(list(reader), expected)
+
     def testRestarting(self):
         """Test that the reader can restart and support multiple users."""
         with open(testlib.get_fixture_path("names.txt"), "r") as fd:
@@ -96,3 +96,5 @@ class RowTupleTest(testlib.EfilterTestCase):
             structured.resolve(rt, 2)
 
         self.assertEqual(structured.resolve(rt, "foo"), "Foo")
+        self.assertEqual(structured.getmembers_runtime(rt),
+                         ("car", "bar", "foo"))
@@ -285,6 +285,23 @@ class ParserTest(testlib.EfilterTestCase):
             ast.Sum(ast.Product(ast.Var("x"),
                                 ast.Var("y")), ast.Var("z")))
 
+    def testAssociativeChains(self):
+        self.assertQueryMatches(
+            "x and y and z",
+            ast.Intersection(ast.Var("x"), ast.Var("y"), ast.Var("z")))
+
+        self.assertQueryMatches(
+            "x + y + z * w",
+            ast.Sum(ast.Var("x"), ast.Var("y"),
+                    ast.Product(ast.Var("z"), ast.Var("w"))))
+
+        # Only associative operators are merged.
+        self.assertQueryMatches(
+            "x - y - z",
+            ast.Difference(
+                ast.Difference(ast.Var("x"), ast.Var("y")),
+                ast.Var("z")))
+
     def testMultiWordOperators(self):
         self.assertQueryMatches(
             "x not in y",
@@ -20,7 +20,9 @@ EFILTER test suite.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+import gc
 import unittest
+import weakref
 
 from efilter import dispatch
 from efilter import protocol
@@ -96,3 +98,43 @@ class TypesTest(unittest.TestCase):
     def testDynamicImplementation(self):
         self.assertTrue(isinstance(Krava(), IBovine))
         self.assertEqual(say_moo(Krava()), "Buu")
+
+    def testIsaAfterRegistration(self):
+        class Zubr(object):
+            def say_moo(self):
+                return "Muu"
+
+            def graze(self):
+                "Om nom"
+
+        self.assertFalse(protocol.isa(Zubr, IBovine))
+
+        # The cached answer must not survive the type joining the protocol.
+        IBovine.implicit_static(for_type=Zubr)
+        self.assertTrue(protocol.isa(Zubr, IBovine))
+
+    def testIsaCacheDoesNotLeak(self):
+        class Zubr(object):
+            pass
+
+        self.assertFalse(protocol.isa(Zubr, IBovine))
+        self.assertFalse(protocol.isa(Zubr, IBovine))
+
+        # Classes generated at runtime must be freed once nothing else uses
+        # them.
+        zubr_ref = weakref.ref(Zubr)
+        del Zubr
+        gc.collect()
+        self.assertIsNone(zubr_ref())
+
+    def testImplements(self):
+        self.assertTrue(protocol.implements(Kyr(), IBovine))
+        self.assertFalse(protocol.implements(object(), IBovine))
+
+        class KyrProxy(object):
+            __class__ = Kyr
+
+        self.assertTrue(protocol.implements(KyrProxy(), IBovine))
+
+        with self.assertRaises(TypeError):
+            protocol.implements(Kyr, IBovine)
@@ -0,0 +1,42 @@
+# EFILTER Forensic Query Language
+#
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+EFILTER test suite.
+"""
+
+__author__ = "Adam Sindelar <adamsh@google.com>"
+
+import unittest
+
+from efilter.protocols import iset
+
+
+class ISetTest(unittest.TestCase):
+    def testSets(self):
+        self.assertEqual(iset.union(set([1]), [2]), set([1, 2]))
+        self.assertEqual(iset.intersection(frozenset([1, 2]), (2, 3)),
+                         frozenset([2]))
+        self.assertEqual(iset.difference(set([1, 2]), [2]), set([1]))
+        self.assertTrue(iset.issuperset(set([1, 2]), [1]))
+        self.assertTrue(iset.contains(set([1]), 1))
+
+    def testSequences(self):
+        self.assertEqual(iset.union([1], (2,)), frozenset([1, 2]))
+        self.assertEqual(iset.intersection((1, 2), [2, 3]), frozenset([2]))
+        self.assertEqual(iset.difference([1, 2], [2]), frozenset([1]))
+        self.assertTrue(iset.issubset([1], set([1, 2])))
+        self.assertFalse(iset.isstrictsuperset([1], [1]))
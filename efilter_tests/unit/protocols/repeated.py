@@ -53,6 +53,12 @@ class RepeatedTest(unittest.TestCase):
         r = repeated.meld("foo", "foo")
         self.assertIsInstance(r, repeated.IRepeated)
 
+    def testMeldIter(self):
+        self.assertEqual(repeated.meld_iter(["foo", None, "bar"]),
+                         repeated.meld("foo", "bar"))
+        self.assertEqual(repeated.meld_iter(x for x in ("foo", None)), "foo")
+        self.assertIsNone(repeated.meld_iter([None]))
+
     def testNulls(self):
         r = None
         for _ in repeated.getvalues(r):
@@ -64,6 +70,14 @@ class RepeatedTest(unittest.TestCase):
         for _ in repeated.getvalues(r):
             self.assertFail()
 
+    def testGetValue(self):
+        self.assertEqual(repeated.getvalue(5), 5)
+        self.assertEqual(repeated.getvalue(None), None)
+        self.assertEqual(repeated.getvalue(repeated.repeated("foo")), "foo")
+
+        with self.assertRaises(TypeError):
+            repeated.getvalue(repeated.repeated("foo", "bar"))
+
     def testTypes(self):
         """Test that types are correctly derived and enforced."""
         with self.assertRaises(TypeError):
@@ -20,12 +20,15 @@ EFILTER test suite.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+import six
 import unittest
 
 from efilter import ast
 from efilter import query
+from efilter import syntax
 
 from efilter.transforms import normalize
+from efilter.transforms import solve
 
 
 class QueryTest(unittest.TestCase):
@@ -61,3 +64,60 @@ class QueryTest(unittest.TestCase):
         original = ("==", ("var", "foo"), ("var", "bar"))
         q = query.Query(original)
         self.assertEqual(q.source, original)
+
+    def testGuessSyntax(self):
+        self.assertEqual(query.guess_source_syntax("foo"), "dottysql")
+        self.assertEqual(query.guess_source_syntax(("var", "foo")), "lisp")
+        self.assertEqual(query.guess_source_syntax(ast.Var("foo")),
+                         "expression")
+        self.assertIsNone(query.guess_source_syntax(5))
+
+    def testStr(self):
+        self.assertEqual(str(query.Query("foo == bar")), "foo == bar")
+        self.assertEqual(str(query.Query(("var", "foo"))), "('var', 'foo')")
+
+        # Non-ASCII sources come out as text, and as UTF-8 on Python 2.
+        q = query.Query(u"name == '\u017elu\u0165ou\u010dk\u00fd'")
+        self.assertEqual(six.text_type(q), q.source)
+        if six.PY2:
+            self.assertEqual(str(q), q.source.encode("utf-8"))
+        else:
+            self.assertEqual(str(q), q.source)
+
+    def testHash(self):
+        q = query.Query("foo == bar")
+        self.assertEqual(hash(q), hash(q.root))
+        self.assertEqual(hash(q), hash(query.Query("foo   ==   bar")))
+        self.assertIn(q, set([query.Query("foo == bar")]))
+
+        # Expressions cache their own hashes, which must stay consistent with
+        # equality.
+        expr = ast.Equivalence(ast.Var("foo"), ast.Literal(1))
+        self.assertEqual(hash(expr), hash(expr))
+        self.assertEqual(hash(expr),
+                         hash(ast.Equivalence(ast.Var("foo"), ast.Literal(1))))
+        self.assertNotEqual(hash(expr),
+                            hash(ast.Equivalence(ast.Var("foo"),
+                                                 ast.Literal(2))))
+
+    def testReassignRoot(self):
+        q = query.Query("foo + 0 == bar")
+        hash(q)
+        normalize.normalize(q)
+        solve.solve(q, {"foo": 1, "bar": 1})
+
+        # Caches of the old root must not survive reassigning it.
+        q.root = ast.Equivalence(ast.Var("foo"), ast.Literal(2))
+        self.assertEqual(hash(q), hash(q.root))
+        self.assertEqual(normalize.normalize(q).root, q.root)
+        self.assertFalse(solve.solve(q, {"foo": 1}).value)
+        self.assertTrue(solve.solve(q, {"foo": 2}).value)
+
+    def testReregisterFormatter(self):
+        original = syntax.Syntax.get_formatter("lisp")
+        try:
+            syntax.Syntax.register_formatter("lisp", lambda root: "new")
+            q = query.Query(ast.Var("foo"), syntax="lisp")
+            self.assertEqual(q.source, "new")
+        finally:
+            syntax.Syntax.register_formatter("lisp", original)
@@ -22,8 +22,11 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 import unittest
 
+from efilter import protocol
 from efilter import scope
 
+from efilter.stdlib import core as std_core
+
 
 class ScopeTest(unittest.TestCase):
     def testResolutionOrder(self):
@@ -39,3 +42,41 @@ class ScopeTest(unittest.TestCase):
         # Stack remains flat.
         self.assertEqual(s.locals, {"x": 3})
         self.assertEqual(s.globals, {"x": 1})
+
+    def testLateShadowing(self):
+        local = {}
+        s = scope.ScopeStack({"x": 1}, local)
+        self.assertEqual(s.resolve("x"), 1)
+
+        # A name defined in a more local scope after the first lookup shadows
+        # the global one straight away.
+        local["x"] = 2
+        self.assertEqual(s.resolve("x"), 2)
+
+        # Names that disappear from the cached scope are searched for again.
+        del local["x"]
+        self.assertEqual(s.resolve("x"), 1)
+
+        with self.assertRaises(AttributeError):
+            s.resolve("y")
+
+    def testGetMembers(self):
+        s = scope.ScopeStack({"x": 1}, {"y": 2}, {"x": 3})
+        self.assertEqual(s.getmembers(), set(["x", "y"]))
+        self.assertEqual(s.getmembers_runtime(), set(["x", "y"]))
+
+    def testStaticReflection(self):
+        class Foo(object):
+            pass
+
+        s = scope.ScopeStack(dict)
+        # Types without static members reflect as AnyType.
+        self.assertEqual(s.reflect_static_member("x"), protocol.AnyType)
+        with self.assertRaises(NotImplementedError):
+            scope.ScopeStack(Foo).getmembers_static()
+
+    def testReflectionCache(self):
+        s = scope.ScopeStack(std_core.MODULE, {"x": 1})
+        self.assertEqual(s.reflect("take"), std_core.Take)
+        self.assertEqual(s.reflect("take"), std_core.Take)
+        self.assertEqual(s.reflect("nonexistent"), protocol.AnyType)
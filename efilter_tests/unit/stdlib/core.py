@@ -22,6 +22,9 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 from efilter_tests import testlib
 
+from efilter import scope
+
+from efilter.protocols import applicative
 from efilter.protocols import repeated
 
 from efilter.stdlib import core
@@ -37,6 +40,8 @@ class CoreTest(testlib.EfilterTestCase):
 
         self.assertEqual(core.First()(None), None)
 
+        self.assertEqual(core.First()(repeated.lazy(lambda: iter((5, 6)))), 5)
+
     # Sigh. Python can't even do lexical scoping properly, which is why this
     # is class-level instead of being function-local below (since the nested
     # function can't see locals from the surrounding scope.)
@@ -84,6 +89,15 @@ class CoreTest(testlib.EfilterTestCase):
             core.Take()(10, (1, 2, 3)),
             repeated.meld(1, 2, 3))
 
+        # A single element is still a repeated value, not a scalar.
+        self.assertIsInstance(core.Take()(1, (5,)), repeated.IRepeated)
+        self.assertEqual(list(repeated.getvalues(core.Take()(1, (5,)))), [5])
+
+        # Nones in tuples are kept.
+        self.assertEqual(
+            list(repeated.getvalues(core.Take()(2, (None, None, 1)))),
+            [None, None])
+
         # Taking zero.
         self.assertValuesEqual(
             core.Take()(0, (1, 2, 3)),
@@ -94,6 +108,14 @@ class CoreTest(testlib.EfilterTestCase):
             core.Take()(10, ()),
             None)
 
+        # A negative count takes everything.
+        self.assertValuesEqual(
+            core.Take()(-1, (1, 2, 3)),
+            repeated.meld(1, 2, 3))
+        self.assertValuesEqual(
+            core.Take()(-1, repeated.meld(1, 2, 3)),
+            repeated.meld(1, 2, 3))
+
     def testDrop(self):
         self.assertValuesEqual(
             core.Drop()(2, repeated.meld(1, 2, 3, 4)),
@@ -109,11 +131,25 @@ class CoreTest(testlib.EfilterTestCase):
             core.Drop()(10, (1, 2, 3)),
             None)
 
+        self.assertIsInstance(core.Drop()(1, (4, 5)), repeated.IRepeated)
+        self.assertEqual(list(repeated.getvalues(core.Drop()(1, (4, 5)))), [5])
+        self.assertEqual(
+            list(repeated.getvalues(core.Drop()(1, (1, None, None)))),
+            [None, None])
+
         # Dropping zero.
         self.assertValuesEqual(
             core.Drop()(0, (1, 2, 3)),
             repeated.meld(1, 2, 3))
 
+        # A negative count drops nothing.
+        self.assertValuesEqual(
+            core.Drop()(-1, (1, 2, 3)),
+            repeated.meld(1, 2, 3))
+        self.assertValuesEqual(
+            core.Drop()(-1, repeated.meld(1, 2, 3)),
+            repeated.meld(1, 2, 3))
+
     def testCount(self):
         self.assertEqual(
             core.Count()(repeated.meld(1, 2, 3, 4)),
@@ -124,10 +160,59 @@ class CoreTest(testlib.EfilterTestCase):
             core.Reverse()(repeated.meld(1, 2, 3, 4)),
             repeated.meld(4, 3, 2, 1))
 
+        # Lazy values should also work.
+        self.assertValuesEqual(
+            core.Reverse()(repeated.lazy(lambda: iter((1, 2, 3)))),
+            repeated.meld(3, 2, 1))
+
+        self.assertEqual(core.Reverse()((1, "foo", 3)), (3, "foo", 1))
+
     def testLower(self):
         self.assertEqual(
             core.Lower()("FOO"),
             "foo")
 
+        self.assertEqual(core.Lower().apply(["FOO"], {}), "foo")
+        self.assertEqual(core.Lower().apply([], {"x": b"FOO"}), b"foo")
+
     def testFind(self):
         self.assertEqual(core.Find()("foobar", "bar"), 3)
+        self.assertEqual(core.Find().apply(["foobar", "baz"], {}), -1)
+        self.assertEqual(
+            core.Find().apply(["foobar"], {"needle": "oo"}), 1)
+
+    def testLibraryModule(self):
+        self.assertIn("take", core.MODULE.getmembers_runtime())
+        self.assertEqual(core.MODULE.resolve("take").name, "take")
+        self.assertEqual(core.MODULE.reflect_runtime_member("take"), core.Take)
+
+        # Unknown names must be a miss, so that a stack of modules keeps
+        # looking in the outer ones.
+        with self.assertRaises(KeyError):
+            core.MODULE.reflect_runtime_member("nonexistent")
+
+        outer = core.LibraryModule(name="efilter_tests.stdlib.core.outer",
+                                   vars={"foo": 1})
+        stack = scope.ScopeStack(outer, core.MODULE)
+        self.assertEqual(stack.reflect_runtime_member("foo"), int)
+        self.assertEqual(stack.reflect_runtime_member("take"), core.Take)
+
+        with self.assertRaises(ValueError):
+            core.LibraryModule(name=core.MODULE.name, vars={})
+
+        # The original module stays registered.
+        self.assertIs(core.LibraryModule.ALL_MODULES[core.MODULE.name],
+                      core.MODULE)
+
+    def testApplicative(self):
+        self.assertEqual(applicative.apply(core.Lower(), ["FOO"], {}), "foo")
+        self.assertEqual(
+            applicative.apply(core.Count(), [repeated.meld(1, 2)], {}), 2)
+
+        self.assertEqual(applicative.reflect_return(core.Take),
+                         repeated.IRepeated)
+        # Instances reflect the same as their classes.
+        self.assertEqual(applicative.reflect_return(core.Take()),
+                         repeated.IRepeated)
+        self.assertEqual(applicative.reflect_args(core.Find()),
+                         applicative.reflect_args(core.Find))
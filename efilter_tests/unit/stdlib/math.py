@@ -22,6 +22,8 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 from efilter_tests import testlib
 
+from efilter.protocols import repeated
+
 from efilter.stdlib import math as std_math
 
 
@@ -33,3 +35,58 @@ class MathTest(testlib.EfilterTestCase):
         self.assertEqual(std_math.LevenshteinDistance()("Kitten", "kittens"), 2)
         self.assertEqual(std_math.LevenshteinDistance()("", "foo"), 3)
         self.assertEqual(std_math.LevenshteinDistance()("sitting", "kitten"), 3)
+        self.assertEqual(std_math.LevenshteinDistance()("a", "b"), 1)
+        self.assertEqual(std_math.LevenshteinDistance()("ab", "ba"), 2)
+        self.assertEqual(std_math.LevenshteinDistance()("abc", "xbcd"), 2)
+        self.assertEqual(std_math.LevenshteinDistance()("foo", ""), 3)
+
+        # Long strings take the slower path, which should agree with Myers.
+        x = "kitten" * 11
+        y = "sitting" * 11
+        self.assertEqual(std_math.LevenshteinDistance()(x, y),
+                         std_math._levenshtein(x, y))
+        self.assertEqual(std_math._myers_distance(x[:64], y),
+                         std_math._levenshtein(x[:64], y))
+
+        # Unhashable elements only need to compare equal.
+        self.assertEqual(
+            std_math.LevenshteinDistance()([[1], [2]], [[1], [3]]), 1)
+        self.assertEqual(
+            std_math.LevenshteinDistance()(["a", "b"], [["a"], "b"]), 1)
+
+    def testVectorSum(self):
+        self.assertEqual(
+            std_math.VectorSum()([(1, 2, 3), (4, 5, 6), (7, 8, 9)]),
+            [12, 15, 18])
+
+        with self.assertRaises(ValueError):
+            std_math.VectorSum().fold([(1, 2), (1, 2, 3)])
+
+    def testMean(self):
+        self.assertEqual(std_math.Mean()([1, 2, 3, 6]), 3.0)
+        self.assertEqual(std_math.Mean().fold((1, 2, 3)), (6, 3))
+        self.assertEqual(
+            std_math.Mean()(repeated.meld(1, 2, 3, 6), chunk_size=3), 3.0)
+
+        # Lazy values and plain iterators should only be walked once.
+        self.assertEqual(
+            std_math.Mean().fold(repeated.lazy(lambda: iter((1, 2, 3, 6)))),
+            (12, 4))
+        self.assertEqual(std_math.Mean().fold(iter((1, 2, 3))), (6, 3))
+
+    def testModule(self):
+        for name in ("mean", "sum", "vector_sum", "levenshtein"):
+            self.assertIn(name, std_math.MODULE.getmembers_runtime())
+
+    def testLevenshteinCache(self):
+        std_math._LEVENSHTEIN_CACHE.clear()
+        levenshtein = std_math.LevenshteinDistance()
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("sitting", "kitten"), 3)
+        # Both orders share one entry, because distance is symmetric.
+        self.assertEqual(len(std_math._LEVENSHTEIN_CACHE), 1)
+
+        # Sequences other than strings still work, they're just not cached.
+        self.assertEqual(levenshtein(["a", "b"], ["a", "c"]), 1)
+        self.assertEqual(levenshtein([["a"], ["b"]], [["a"], ["c"]]), 1)
+        self.assertEqual(len(std_math._LEVENSHTEIN_CACHE), 1)
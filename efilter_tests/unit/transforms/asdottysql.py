@@ -22,6 +22,7 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 
 from efilter_tests import testlib
 
+from efilter import ast
 from efilter import query
 
 from efilter.transforms import asdottysql
@@ -182,6 +183,14 @@ class AsDottySQLTest(testlib.EfilterTestCase):
             original="x.y.z",
             output="x.y.z")
 
+        self.assertOutput(
+            original="(x + y).z.w",
+            output="(x + y).z.w")
+
+        self.assertOutput(
+            original="f(x)[5].y.z",
+            output="f(x)[5].y.z")
+
     def testRepeat(self):
         self.assertOutput(
             original="(10, 15, 20 + 5)",
@@ -200,3 +209,43 @@ class AsDottySQLTest(testlib.EfilterTestCase):
         self.assertOutput(
             original="if foo then bar",
             output="if foo then bar")
+
+    def testSharedSubexpressions(self):
+        shared = ast.Sum(ast.Var("x"), ast.Literal(5))
+        root = ast.Intersection(ast.Equivalence(shared, ast.Literal(10)),
+                                ast.Equivalence(shared, ast.Literal(15)))
+        self.assertEqual(asdottysql.format_dottysql(root),
+                         "x + 5 == 10 and x + 5 == 15")
+        self.assertEqual(asdottysql.format_dottysql(root),
+                         asdottysql.asdottysql(root))
+        self.assertEqual(query.Query(root).source,
+                         "x + 5 == 10 and x + 5 == 15")
+
+    def testLateImplementation(self):
+        class Secret(ast.Var):
+            __slots__ = ()
+
+        root = ast.Sum(Secret("x"), ast.Literal(5))
+        self.assertEqual(asdottysql.asdottysql(root), "x + 5")
+
+        asdottysql.asdottysql.implement(
+            for_type=Secret, implementation=lambda expr: "redacted")
+        self.assertEqual(asdottysql.asdottysql(root), "redacted + 5")
+
+    def testTemporarySubexpressions(self):
+        class Expanded(ast.Var):
+            __slots__ = ()
+
+        # Each temporary Sum is freed before the next one is built, so its
+        # children's ids are likely to be reused.
+        def expand(expr):
+            return ", ".join(
+                asdottysql.asdottysql(
+                    ast.Sum(ast.Literal(i), ast.Literal(i * 10)))
+                for i in range(3))
+
+        asdottysql.asdottysql.implement(for_type=Expanded,
+                                        implementation=expand)
+        self.assertEqual(
+            asdottysql.format_dottysql(ast.Tuple(Expanded("x"))),
+            "[0 + 0, 1 + 10, 2 + 20]")
@@ -66,3 +66,14 @@ class AsLispTest(unittest.TestCase):
         expected = ("var", "x")
 
         self.assertEqual(aslisp.aslisp(query), expected)
+
+    def testLateImplementation(self):
+        class Secret(ast.Var):
+            __slots__ = ()
+
+        query = ast.Sum(Secret("x"), ast.Literal(5))
+        self.assertEqual(aslisp.aslisp(query), ("+", ("var", "x"), 5))
+
+        aslisp.aslisp.implement(
+            for_type=Secret, implementation=lambda expr: "redacted")
+        self.assertEqual(aslisp.aslisp(query), ("+", "redacted", 5))
@@ -23,6 +23,7 @@ __author__ = "Adam Sindelar <adamsh@google.com>"
 from efilter_tests import mocks
 from efilter_tests import testlib
 
+from efilter import ast
 from efilter import protocol
 from efilter import query as q
 
@@ -187,3 +188,25 @@ class InferTypeTest(testlib.EfilterTestCase):
                 q.Query("Process.parent.pid - 1"),
                 mocks.MockRootType),
             number.INumber)
+
+    def testSharedSubexpressions(self):
+        shared = ast.Resolve(ast.Var("proc"), ast.Literal("pid"))
+        query = q.Query(ast.Repeat(shared, shared))
+        self.assertIsa(
+            infer_type.infer_type(query, mocks.MockRootType),
+            number.INumber)
+        self.assertIsa(
+            infer_type.infer_type(ast.Repeat(shared), mocks.MockRootType),
+            number.INumber)
+
+        # The memo only lives for the duration of the call.
+        self.assertIsNone(infer_type._LOCAL.memo)
+
+    def testNestedScopesReused(self):
+        # Both maps have the same context, so the second one reuses the scope
+        # (and results) of the first.
+        shared = ast.Map(ast.Var("proc"), ast.Var("pid"))
+        self.assertIsa(
+            infer_type.infer_type(q.Query(ast.Repeat(shared, shared)),
+                                  mocks.MockRootType),
+            number.INumber)
@@ -20,6 +20,7 @@ EFILTER test suite.
 
 __author__ = "Adam Sindelar <adamsh@google.com>"
 
+from efilter import ast
 from efilter import query
 
 from efilter.transforms import normalize
@@ -119,3 +120,56 @@ class NormalizeTest(testlib.EfilterTestCase):
                 ("var", "w")))
 
         self.assertEqual(normalize.normalize(original), expected)
+
+    def testUnchangedSubtreesReused(self):
+        """Subtrees with nothing to normalize shouldn't be rebuilt."""
+        original = query.Query(
+            ("apply",
+                ("var", "f"),
+                ("map", ("var", "x"), ("var", "y"))))
+
+        self.assertIs(normalize.normalize(original).root, original.root)
+
+        original = query.Query(("|", ("var", "x"), ("var", "y")))
+        self.assertIs(normalize.normalize(original).root, original.root)
+
+    def testDeepNesting(self):
+        """Deeply nested expressions shouldn't hit the recursion limit."""
+        root = ast.Var("x0")
+        for i in range(1, 2000):
+            root = ast.Union(root, ast.Var("x%d" % i))
+
+        normalized = normalize.normalize(root)
+        self.assertIsInstance(normalized, ast.Union)
+        self.assertEqual(len(normalized.children), 2000)
+        self.assertEqual(normalized.children[-1], ast.Var("x1999"))
+
+    def testQueryNormalizedOnce(self):
+        original = query.Query("x or (y or z)")
+        normalized = normalize.normalize(original)
+        self.assertIs(normalize.normalize(original), normalized)
+        self.assertIs(normalize.normalize(normalized), normalized)
+
+    def testRebuiltNodes(self):
+        """Rebuilt nodes should be the same as freshly constructed ones."""
+        original = ast.Union(ast.Var("x"),
+                             ast.Union(ast.Var("y"), ast.Var("z"), start=5),
+                             start=0, end=10)
+        normalized = normalize.normalize(original)
+        self.assertEqual(normalized,
+                         ast.Union(ast.Var("x"), ast.Var("y"), ast.Var("z")))
+        self.assertIsInstance(normalized.children, tuple)
+        self.assertEqual(hash(normalized),
+                         hash(ast.Union(ast.Var("x"), ast.Var("y"),
+                                        ast.Var("z"))))
+
+    def testSharedSubexpressions(self):
+        """Shared subexpressions should be normalized once and stay shared."""
+        shared = ast.Union(ast.Var("x"), ast.Union(ast.Var("y"), ast.Var("z")))
+        original = ast.Intersection(shared, ast.Complement(ast.Var("w")),
+                                    shared)
+        normalized = normalize.normalize(original)
+        self.assertEqual(
+            normalized.children[0],
+            ast.Union(ast.Var("x"), ast.Var("y"), ast.Var("z")))
+        self.assertIs(normalized.children[0], normalized.children[2])
@@ -27,6 +27,7 @@ from efilter import query as q
 
 from efilter.protocols import reducer
 from efilter.protocols import repeated
+from efilter.protocols import structured
 
 from efilter.transforms import solve
 
@@ -296,6 +297,25 @@ class SolveTest(testlib.EfilterTestCase):
                 mocks.Process(1, None, None),
                 mocks.Process(2, None, None)))
 
+        # Sorting the output of a filter.
+        self.assertEqual(
+            solve.solve(
+                q.Query("select * from Process where pid > 1 order by pid"),
+                {"Process": repeated.meld(
+                    mocks.Process(3, None, None),
+                    mocks.Process(1, None, None),
+                    mocks.Process(2, None, None))}).value,
+            repeated.meld(
+                mocks.Process(2, None, None),
+                mocks.Process(3, None, None)))
+
+        self.assertIsNone(
+            solve.solve(
+                q.Query("select * from Process where pid > 5 order by pid"),
+                {"Process": repeated.meld(
+                    mocks.Process(2, None, None),
+                    mocks.Process(1, None, None))}).value)
+
         # How about nested repeated fields? This should sort the process
         # children and return those.
         self.assertEqual(
@@ -578,3 +598,116 @@ class SolveTest(testlib.EfilterTestCase):
                     "Process.command == 'foo')"),
             {"Process": {"parent": {"Process": {"pid": 1}}}})
         self.assertTrue(result.value)
+
+    def testUnsupportedSubexpression(self):
+        class Unsupported(ast.ValueExpression):
+            __slots__ = ()
+
+        with self.assertRaises(NotImplementedError):
+            solve.solve(ast.Complement(Unsupported(1)), {})
+
+    def testCompiledQueries(self):
+        """Solving a query should agree with solving its root directly."""
+        data = {"x": 1, "y": 3, "z": None, "name": "foo"}
+        for source in ("x == 1 and y > 2", "x == 5 or y < 2 or name",
+                       "not (x == 1) or y >= 3", "x < y < 5",
+                       "z > 1", "x == 1 and 'foo' == name"):
+            query = q.Query(source)
+            root_result = solve.solve(query.root, data)
+            for _ in range(2):
+                self.assertEqual(solve.solve(query, data), root_result)
+
+        with self.assertRaises(errors.EfilterTypeError):
+            solve.solve(q.Query("x > 'foo'"), {"x": 1})
+
+        with self.assertRaises(errors.EfilterTypeError):
+            solve.solve(q.Query("x == rows"),
+                        {"x": 1, "rows": repeated.meld(1, 2)})
+
+        with self.assertRaises(errors.EfilterKeyError):
+            solve.solve(q.Query("x == 1 and missing == 2"), {"x": 1})
+
+    def testConstantFolding(self):
+        query = q.Query("x == 10 * (2 + 3) and 'foo' in ('foo', 'bar')")
+        self.assertTrue(solve.solve(query, {"x": 50}).value)
+        self.assertFalse(solve.solve(query, {"x": 10}).value)
+
+        # Errors are still raised when the query is solved.
+        query = q.Query("x == 5 or 1 > 'foo'")
+        self.assertTrue(solve.solve(query, {"x": 5}).value)
+        with self.assertRaises(errors.EfilterTypeError):
+            solve.solve(query, {"x": 6})
+
+    def testCompiledArithmetic(self):
+        data = {"x": 10, "y": 4, "name": "foo"}
+        for source in ("x + y * 2 - 1", "x - y - 1", "x / y", "x * y * y",
+                       "(x - y) / 2 + 1 == 4"):
+            query = q.Query(source)
+            self.assertEqual(solve.solve(query, data),
+                             solve.solve(query.root, data))
+
+        for source in ("x + name", "name * name", "name - x", "x - name"):
+            with self.assertRaises(errors.EfilterTypeError):
+                solve.solve(q.Query(source), data)
+
+    def testCompiledMembership(self):
+        data = {"x": "foo", "n": 2, "f": 2.0, "z": None,
+                "rows": repeated.meld("foo", "bar")}
+        for source in ("x in ('foo', 'bar')", "x in ['bar']",
+                       "x in ('foobar')", "n in (1, 2, 3)", "f in (1, 2)",
+                       "z in ('foo', 'bar')", "x not in ('bar', 'baz')",
+                       "n in ('1', '2')", "x in ['foo', 1]"):
+            query = q.Query(source)
+            self.assertEqual(solve.solve(query, data),
+                             solve.solve(query.root, data))
+
+        with self.assertRaises(errors.EfilterError):
+            solve.solve(q.Query("rows in ('foo', 'bar')"), data)
+
+    def testLateImplementation(self):
+        class Doubled(ast.Literal):
+            __slots__ = ()
+
+        expr = ast.Complement(Doubled(0))
+        self.assertTrue(solve.solve(expr, {}).value)
+
+        # Registering an implementation after the type has been solved must
+        # still take effect for subexpressions.
+        solve.solve.implement(
+            for_type=Doubled,
+            implementation=lambda expr, vars: solve.Result(
+                expr.value * 2 + 1, ()))
+        self.assertFalse(solve.solve(expr, {}).value)
+
+    def testVarResolvedOnce(self):
+        class CountingScope(object):
+            calls = 0
+
+            def resolve(self, name):
+                self.calls += 1
+                raise KeyError(name)
+
+        structured.IStructured.implicit_static(CountingScope)
+
+        # Host resolvers can be slow or have side effects, so misses must not
+        # resolve the name a second time to build the error.
+        counting = CountingScope()
+        with self.assertRaises(errors.EfilterKeyError):
+            solve.solve(q.Query("x"), counting)
+
+        self.assertEqual(counting.calls, 1)
+
+    def testLateImplementationCompiled(self):
+        class Doubled(ast.Literal):
+            __slots__ = ()
+
+        query = q.Query(ast.Complement(Doubled(0)))
+        self.assertTrue(solve.solve(query, {}).value)
+
+        # The query was compiled by the first solve, and must be recompiled to
+        # pick up the new implementation.
+        solve.solve.implement(
+            for_type=Doubled,
+            implementation=lambda expr, vars: solve.Result(
+                expr.value * 2 + 1, ()))
+        self.assertFalse(solve.solve(query, {}).value)